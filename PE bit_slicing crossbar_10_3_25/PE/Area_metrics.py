@@ -1,17 +1,70 @@
+import numpy as np
+from components.dac import DAC
+from components.crossbar import Crossbar
+from components.subtractor import Subtractor
+from components.ramp_generator import RampGenerator
+from components.comparator import Comparator
+from components.tdc import TDC
+
+
+def instance_counts(array_rows, array_columns):
+    """
+    Number of instances of each component in one PE: a DAC per row, one
+    subtractor, comparator and TDC per column pair, one shared ramp.
+    """
+    column_pairs = Subtractor.column_pairs(np.asarray(array_columns))
+    return {
+        'dac': np.asarray(array_rows),
+        'crossbar': 1,
+        'subtractors': column_pairs,
+        'ramp_generator': 1,
+        'comparator': column_pairs,
+        'tdc': column_pairs,
+    }
+
+
+def component_areas(array_rows, array_columns, num_bits, num_tdc, num_pes=1):
+    """
+    Area of every component type over num_pes identical PEs. All parameters may
+    be NumPy arrays, so a whole design space is evaluated in one call.
+
+    Returns:
+        Dictionary of component name to area, broadcast over the parameters
+    """
+    counts = instance_counts(array_rows, array_columns)
+    unit_areas = {
+        'dac': DAC.area(np.asarray(num_bits)),
+        'crossbar': Crossbar.area(np.asarray(array_rows), np.asarray(array_columns)),
+        'subtractors': Subtractor.AREA,
+        'ramp_generator': RampGenerator.AREA,
+        'comparator': Comparator.AREA,
+        'tdc': TDC.area(np.asarray(num_tdc)),
+    }
+    return {name: num_pes * counts[name] * unit_areas[name] for name in counts}
+
+
+def total_area(array_rows, array_columns, num_bits, num_tdc, num_pes=1):
+    """Vectorized total area of num_pes PEs"""
+    return sum(component_areas(array_rows, array_columns, num_bits, num_tdc, num_pes).values())
+
+
 class AreaMetrics:
     def __init__(self, system_components):
         self.components = system_components
-        
-    def calculate_area(self):
-        """Calculate total delay for the system"""
-        # For subtractors, take the maximum delay since they operate in parallel
-        subtractors_delay = max(subtractor.get_area() for subtractor in self.components['subtractors'])
-        
-        return sum([
-            self.components['dac'].get_area(),
-            self.components['crossbar'].get_area(),
-            subtractors_delay,  # Use the maximum delay from subtractors
-            self.components['ramp_generator'].get_area(),
-            self.components['comparator'].get_area(),
-            self.components['tdc'].get_area()
-        ])
\ No newline at end of file
+
+    def calculate_breakdown(self, num_pes=1):
+        """Area of each component type over an array of num_pes PEs"""
+        crossbar = self.components['crossbar']
+        areas = component_areas(crossbar.array_rows, crossbar.array_columns,
+                                self.components['dac'].num_bits, self.components['tdc'].num_tdc, num_pes)
+        # Every instantiated subtractor counts, not just the largest one, and each
+        # has its own comparator and TDC
+        subtractors = self.components['subtractors']
+        areas['subtractors'] = num_pes * sum(subtractor.get_area() for subtractor in subtractors)
+        areas['comparator'] = num_pes * len(subtractors) * self.components['comparator'].get_area()
+        areas['tdc'] = num_pes * len(subtractors) * self.components['tdc'].get_area()
+        return {name: float(area) for name, area in areas.items()}
+
+    def calculate_area(self, num_pes=1):
+        """Calculate total area of the system, or of an array of num_pes PEs"""
+        return sum(self.calculate_breakdown(num_pes).values())
@@ -1,18 +1,43 @@
+import numpy as np
+
 class EnergyMetrics:
     def __init__(self, system_components):
         self.components = system_components
-        
-    def calculate_energy(self, operation_time):
-        """Calculate total energy consumption for the system"""
-        # Calculate subtractors energy separately since it's a list
-        subtractors_energy = sum(subtractor.get_energy() for subtractor in self.components['subtractors'])
-        
-        return sum([
-            self.components['dac'].get_energy(1),
-            self.components['crossbar'].get_energy([1]),
-            subtractors_energy,  # Add the total energy from all subtractors
-            self.components['ramp_generator'].get_energy(operation_time),
-            self.components['comparator'].get_energy(),
-            self.components['tdc'].get_energy(operation_time)
-        ])
 
+    def calculate_energy(self, inputs, column_outputs, stop_times, end_times):
+        """
+        Activity-based energy of one or more processed input vectors. Every term
+        scales with what the hardware actually did and is evaluated on whole
+        arrays, so leading (batch, cycle, tile...) dimensions are kept.
+
+        Parameters:
+            inputs: Digital inputs applied to the selected rows, shape (..., rows)
+            column_outputs: Crossbar column outputs, shape (..., array_columns)
+            stop_times: Ramp crossing time of each column pair, shape (..., 16)
+            end_times: Time each comparator stayed active, shape (..., 16)
+
+        Returns:
+            Dictionary of per-component energies and their 'total', each of shape (...)
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        stop_times = np.asarray(stop_times, dtype=float)
+        end_times = np.maximum(np.asarray(end_times, dtype=float), 0)
+
+        energy = {
+            # One DAC pulse per input LSB on every selected row
+            'dac': self.components['dac'].get_energy(inputs).sum(axis=-1),
+            # Charge conducted by the cells into the column capacitors
+            'crossbar': self.components['crossbar'].get_activity_energy(column_outputs),
+            # One subtraction per column pair and conversion
+            'subtractors': sum(subtractor.get_activity_energy(1) for subtractor in self.components['subtractors']),
+            # The ramp runs until the last column pair has crossed
+            'ramp_generator': self.components['ramp_generator'].get_activity_energy(end_times.max(axis=-1)),
+            # Each comparator is active until its own crossing
+            'comparator': self.components['comparator'].get_activity_energy(end_times).sum(axis=-1),
+            # One TDC conversion per column pair, measuring up to the crossing
+            'tdc': self.components['tdc'].get_energy(stop_times).sum(axis=-1),
+        }
+        shape = np.broadcast_shapes(*(np.shape(value) for value in energy.values()))
+        energy = {name: np.broadcast_to(value, shape) for name, value in energy.items()}
+        energy['total'] = sum(energy.values())
+        return energy
@@ -6,10 +6,18 @@ import math
 class QuantizedPWMSystem(PWMSystem):
     def __init__(self, config_path):
         super().__init__(config_path)
-        self.chunk_size = self.config.getint('Quantization', 'chunk_size')
-        self.weight_bits = self.config.getint('Quantization', 'weight_bits')
-        self.input_bits = self.config.getint('Quantization', 'input_bits')
-        self.cell_weight_bits = self.config.getint('Crossbar', 'cell_weight_bits')
+        self.chunk_size = self.config.chunk_size
+        self.weight_bits = self.config.weight_bits
+        self.input_bits = self.config.input_bits
+        self.cell_weight_bits = self.config.cell_weight_bits
+        
+        # Each weight spans cells_per_weight odd-numbered columns (one subtractor each)
+        self.cells_per_weight = math.ceil(self.weight_bits / self.cell_weight_bits)
+        self.weights_per_row = self.crossbar.array_columns // (2 * self.cells_per_weight)
+        self.weight_matrix = np.zeros((self.crossbar.array_rows, self.weights_per_row), dtype=np.int64)
+        
+        # Every input chunk is its own crossbar cycle
+        self.cycles_per_mvm = self.input_bits // self.chunk_size
 
     def set_weights(self, weights):
         """Map weights to crossbar, considering cell capacity"""
@@ -23,55 +31,137 @@ class QuantizedPWMSystem(PWMSystem):
         if total_weight_bits > max_crossbar_bits:
             raise ValueError(f"Total weight bits ({total_weight_bits}) exceeds crossbar capacity of {max_crossbar_bits} bits")
 
+        # Weights fill the rows in order, weights_per_row weights per row
+        weight_matrix = np.zeros((self.crossbar.array_rows, self.weights_per_row), dtype=np.int64)
+        weight_matrix.flat[:len(weights)] = weights
+        
         padded_weights = np.zeros((self.crossbar.array_rows, self.crossbar.array_columns))
+        layout = self.cell_layout(weight_matrix)
+        padded_weights[:, :layout.shape[1]] = layout
+
+        self.set_cells(padded_weights)
         
-        # Calculate weights that can fit per row
-        cells_per_weight = math.ceil(self.weight_bits / self.cell_weight_bits)
-        weights_per_row = self.crossbar.array_columns // (2 * cells_per_weight)
+        # Full-precision weights as laid out on the rows, for the integer reference
+        self.weight_matrix = weight_matrix
 
-        for i, weight in enumerate(weights):
-            # Calculate row and position within row
-            row = i // weights_per_row
-            pos_in_row = i % weights_per_row
-            
-            # Calculate starting column for this weight
-            col_offset = pos_in_row * (cells_per_weight * 2)
-            
-            # Split weight into chunks of cell_weight_bits size
-            chunks = self.split_bits(weight, self.weight_bits, self.cell_weight_bits)
-            
-            # Place chunks in odd-numbered columns
-            for j, chunk in enumerate(chunks):
-                padded_weights[row, col_offset + j*2] = chunk
+    def outputs_per_mvm(self):
+        return self.weights_per_row
 
-        super().set_weights(padded_weights)
+    def cell_layout(self, weight_matrix, dtype=float):
+        """
+        Crossbar cell values for a (rows, positions) matrix of full-precision weights.
+        Chunk j of the weight at position p goes to odd-numbered column
+        p * 2 * cells_per_weight + j * 2, the even-numbered columns stay 0.
+        With the signed weight mapping the chunks of a negative weight's magnitude
+        go to the even-numbered column next to it instead.
+        
+        Returns:
+            numpy array of shape (rows, positions * 2 * cells_per_weight)
+        """
+        weight_matrix = np.asarray(weight_matrix)
+        num_rows, num_positions = weight_matrix.shape
+        
+        # Split all weights into chunks of cell_weight_bits size, shape (chunks, rows, positions)
+        chunks = self.slice_bits(np.abs(weight_matrix), self.weight_bits, self.cell_weight_bits)
+        
+        # Column of every chunk, placed with one fancy-index scatter
+        col_offsets = np.arange(num_positions) * (self.cells_per_weight * 2)
+        cols = col_offsets + 2 * np.arange(chunks.shape[0])[:, None]
+        layout = np.zeros((num_rows, num_positions * self.cells_per_weight * 2), dtype=dtype)
+        chunks = chunks.transpose(1, 0, 2)
+        if self.weight_mapping == 'signed':
+            negative = (weight_matrix < 0)[:, None, :]
+            layout[:, cols] = np.where(negative, 0, chunks)
+            layout[:, cols + 1] = np.where(negative, chunks, 0)
+        else:
+            layout[:, cols] = chunks
+        return layout
 
     def process_inputs(self, digital_inputs, selected_rows):
-        """Process 16-bit inputs in 4-bit chunks, LSB first"""
-        input_chunks = []
-        expanded_rows = []
+        """
+        Process 16-bit inputs as one cycle per 4-bit input chunk and shift-add the
+        TDC codes back into full-precision dot products.
+        
+        Returns:
+            outputs: List of dot products, one per weight position in a row
+            metrics: Dictionary of metrics over all input-chunk cycles
+        """
+        outputs, operation_times = self.process_batch([digital_inputs], selected_rows)
+        metrics = self.calculate_metrics(float(operation_times[0]))
+        return outputs[0].tolist(), metrics
 
-        for input_val, row in zip(digital_inputs, selected_rows):
-            # Split 16-bit input into 4-bit chunks (LSB first)
-            chunks = self.split_bits(input_val, self.input_bits, self.chunk_size, msb_first=False)
+    def process_batch(self, inputs, selected_rows):
+        """
+        Process a batch of 16-bit input vectors. Every input chunk of every sample
+        runs as its own crossbar cycle, all cycles in one batched call.
+        
+        Parameters:
+            inputs: numpy array of shape (batch, len(selected_rows)) of input values
+            selected_rows: List of rows to apply inputs to
+        
+        Returns:
+            outputs: numpy array of dot products, shape (batch, weights_per_row)
+            operation_times: numpy array of per-sample time summed over cycles, shape (batch,)
+        """
+        inputs = np.atleast_2d(np.asarray(inputs))
+        
+        # Split inputs into chunks, LSB chunk first, shape (batch, chunks, len(selected_rows))
+        chunks = self.slice_bits(inputs, self.input_bits, self.chunk_size).transpose(1, 0, 2)
+        num_samples, num_cycles = chunks.shape[:2]
+        
+        codes, cycle_times = super().process_batch(chunks.reshape(-1, inputs.shape[1]), selected_rows)
+        outputs = self.recombine(codes.reshape(num_samples, num_cycles, codes.shape[-1]))
+        self.last_energy = {name: energy.reshape(num_samples, num_cycles).sum(axis=1)
+                            for name, energy in self.last_energy.items()}
+        return outputs, cycle_times.reshape(num_samples, num_cycles).sum(axis=1)
 
-            # Process each chunk on the same row
-            for chunk in chunks:
-                input_chunks.append(chunk)
-                expanded_rows.append(row)
+    def recombine(self, codes):
+        """
+        Shift-add TDC codes across input-chunk cycles and weight-chunk columns.
+        
+        Parameters:
+            codes: TDC outputs of shape (..., input chunks, 16), input chunks LSB first
+        
+        Returns:
+            numpy array of dot products, shape (..., weights_per_row)
+        """
+        num_weight_chunks = self.weight_bits // self.cell_weight_bits
+        codes = np.rint(codes).astype(np.int64)
+        codes = codes[..., :self.weights_per_row * self.cells_per_weight].reshape(
+            codes.shape[:-1] + (self.weights_per_row, self.cells_per_weight))[..., :num_weight_chunks]
+        
+        # Significance of input chunk i and weight chunk j is 2**(i*chunk_size + j*cell_weight_bits)
+        input_shifts = np.arange(codes.shape[-3]) * self.chunk_size
+        weight_shifts = np.arange(num_weight_chunks) * self.cell_weight_bits
+        shifts = input_shifts[:, None, None] + weight_shifts
+        return (codes << shifts).sum(axis=(-3, -1))
 
-        return super().process_inputs(input_chunks, expanded_rows)
+    def reference_dot_product(self, inputs, selected_rows):
+        """
+        Integer GEMM reference for process_batch, shape (batch, weights_per_row).
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=np.int64))
+        return inputs @ self.weight_matrix[np.asarray(selected_rows, dtype=int)]
 
     @staticmethod
     def split_bits(value, total_bits, chunk_size, msb_first=True):
         """Split values into bit chunks with configurable order"""
+        return QuantizedPWMSystem.slice_bits(value, total_bits, chunk_size, msb_first).tolist()
+
+    @staticmethod
+    def slice_bits(values, total_bits, chunk_size, msb_first=True):
+        """
+        Split a whole array of values into bit chunks with shifts and masks.
+        Returns an array of shape (total_bits // chunk_size, *values.shape),
+        chunks ordered as in split_bits.
+        """
+        values = np.asarray(values, dtype=np.int64)
         num_chunks = total_bits // chunk_size
-        chunks = []
-        for i in range(num_chunks):
-            shift = i*chunk_size if msb_first else (num_chunks-1-i)*chunk_size
-            chunk = (value >> shift) & ((1 << chunk_size)-1)
-            chunks.append(chunk)
-        return chunks
+        shifts = np.arange(num_chunks) * chunk_size
+        if not msb_first:
+            shifts = shifts[::-1]
+        shifts = shifts.reshape((num_chunks,) + (1,) * values.ndim)
+        return (values >> shifts) & ((1 << chunk_size) - 1)
 
 if __name__ == "__main__":
     system = QuantizedPWMSystem(Path("config.ini"))
@@ -8,10 +8,13 @@ class Comparator:
         
     def get_energy(self):
         return 0.1 if self.last_comparison else 0
+    def get_activity_energy(self, active_time):
+        return self.get_power() * active_time
         
     def get_delay(self):
         return 0.02  # Fixed delay in ns
     def get_power(self):
         return 0.1
+    AREA = 0.1
     def get_area(self):
-        return 0.1
\ No newline at end of file
+        return self.AREA
\ No newline at end of file
@@ -1,8 +1,9 @@
 import numpy as np
+from tracing import Tracer, COLUMN
 
 class Crossbar:
     def __init__(self, Ron, Roff, on_off_ratio, capacitance, Vdd, pulse_period, array_rows, 
-                 vin, array_columns, A, cell_weight_bits):
+                 vin, array_columns, A, cell_weight_bits, tracer=None, nonideality=None):
         self.Ron = Ron  # 5K ohm
         self.Roff = Roff  # 50K ohm
         self.on_off_ratio = on_off_ratio
@@ -14,11 +15,73 @@ class Crossbar:
         self.cell_weight_bits = cell_weight_bits
         self.A = A
         self.vin = vin
+        self.tracer = tracer if tracer is not None else Tracer()
+        # NonIdealityEngine mapping programmed weights to effective conductances, None for ideal cells
+        self.nonideality = nonideality
+        
+        # Output of a single 1*1 cell; constant for the array so it is computed once
+        self.scaling_factor = ((vin * pulse_period) /
+                               (Ron * capacitance * A)) / on_off_ratio
         
         # Initialize weights as zeros instead of random values
         self.weights = np.zeros((array_rows, array_columns))
        # print(f"Initialized weights shape: {self.weights.shape}")
 
+    @property
+    def weights(self):
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights):
+        self._weights = weights
+        self._effective_weights = None
+
+    @property
+    def nonideality(self):
+        return self._nonideality
+
+    @nonideality.setter
+    def nonideality(self, nonideality):
+        self._nonideality = nonideality
+        self._effective_weights = None
+
+    @property
+    def effective_weights(self):
+        """
+        Weights the array really multiplies with: the programmed weights for ideal
+        cells, else the effective conductances of the non-ideality engine, in
+        weight units. Computed once per weight matrix.
+        """
+        if self.nonideality is None:
+            return self._weights
+        if self._effective_weights is None:
+            self._effective_weights = self.nonideality.apply(self._weights)
+        return self._effective_weights
+
+    def mvm(self, inputs, rows):
+        """
+        Computes the outputs of all columns for inputs applied on the selected rows
+        as a single matrix-vector product.
+        
+        The product sums in a different order than the original per-column loop.
+        With slope * time_step landing codes exactly on ramp grid points, a sum
+        that ties with a grid point can round to the other side, so a few percent
+        of random vectors (5 of 200 in our check) differ from the loop by +-1 TDC
+        code. Golden outputs recorded with the loop need that tolerance.
+        
+        Parameters:
+            inputs: Input values for the selected rows, shape (len(rows),) or (batch, len(rows))
+            rows: List of row indices the inputs are applied to
+            
+        Returns:
+            numpy array of column outputs, shape (array_columns,) or (batch, array_columns)
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.shape[-1] != len(rows):
+            raise ValueError("Number of inputs must match number of selected rows")
+        
+        return self.scaling_factor * (inputs @ self.effective_weights[np.asarray(rows, dtype=int)])
+
     def compute_output(self, input_vector, row):
         """
         Computes the output for all 32 columns in the selected row.
@@ -34,21 +97,12 @@ class Crossbar:
         if len(input_vector) != 1:
             raise ValueError("Input vector must contain a single value for the selected row.")
         
-        column_outputs = []
-        
         # Process all 32 columns
-        for col in range(self.array_columns):
-#            if col % 2 == 0:  # Odd-numbered columns (0, 2, 4...)
-                weighted_sum = input_vector[0] * self.weights[row][col]
-                column_output = ((self.vin * self.pulse_period) / 
-                               (self.Ron * self.capacitance * self.A)) * (weighted_sum / self.on_off_ratio)
-                print(f"Column {col} output: {column_output}")
-#            else:  # Even-numbered columns (1, 3, 5...)
-#                column_output = 0
-#                print(f"Column {col} output: {column_output}")
-                column_outputs.append(column_output)
+        column_outputs = self.mvm(input_vector, [row])
+        if self.tracer.level >= COLUMN:
+            self.tracer.record_array(COLUMN, 'column_output', np.arange(len(column_outputs)), column_outputs)
 
-        return column_outputs
+        return column_outputs.tolist()
     def sum_odd_column(self, input_vector, selected_rows, column_idx):
         """
         Sum the outputs for a specific odd-numbered column across selected rows.
@@ -64,15 +118,10 @@ class Crossbar:
         if len(input_vector) != len(selected_rows):
             raise ValueError("Number of inputs must match number of selected rows")
             
-        column_sum = 0
-        for i, row in enumerate(selected_rows):
-            weighted_sum = input_vector[i] * self.weights[row][column_idx]
-            output = ((self.vin * self.pulse_period) /
-                     (self.Ron * self.capacitance * self.A)) * (weighted_sum / self.on_off_ratio)
-            column_sum += output
-            #print(f"Row {row}, Column {column_idx} contribution: {output}")
+        column_sum = self.mvm(input_vector, selected_rows)[column_idx]
             
-        print(f"Total sum for Column {column_idx}: {column_sum}")
+        if self.tracer.level >= COLUMN:
+            self.tracer.record(COLUMN, 'column_sum', column_idx, column_sum)
         return column_sum
     
     def sum_even_column(self, input_vector, selected_rows, column_idx):
@@ -94,9 +143,21 @@ class Crossbar:
 
     def get_energy(self, input_vector):
         return 0.5 * self.capacitance * len(input_vector) * self.array_columns * (self.Vdd ** 2)*self.array_rows
+    def get_activity_energy(self, column_outputs):
+        """
+        Energy drawn from vin while the cells conduct: each cell passes
+        vin * G * input * pulse_period of charge, which ends up on its column
+        capacitor, so the total is vin * capacitance * sum of column outputs.
+        """
+        return self.vin * self.capacitance * np.sum(column_outputs, axis=-1)
     def get_delay(self):
         return self.Ron * self.capacitance
     def get_power(self):
         return 0.5
+    # Area of one cell, 0.0006 for the 32x32 array
+    CELL_AREA = 0.0006 / 1024
+    @staticmethod
+    def area(array_rows, array_columns):
+        return Crossbar.CELL_AREA * array_rows * array_columns
     def get_area(self):
-        return 0.0006
\ No newline at end of file
+        return self.area(self.array_rows, self.array_columns)
\ No newline at end of file
@@ -19,5 +19,10 @@ class DAC:
         return 1e-9 # delay calculation
     def get_power(self):
         return  0.1
+    # Area per bit of the pulse-width counter, 0.1 for a 4-bit DAC
+    BIT_AREA = 0.1 / 4
+    @staticmethod
+    def area(num_bits):
+        return DAC.BIT_AREA * num_bits
     def get_area(self):
-        return 0.1
\ No newline at end of file
+        return self.area(self.num_bits)
\ No newline at end of file
@@ -1,7 +1,19 @@
+import numpy as np
+
 class RampGenerator:
-    def __init__(self, slope, time_step):
+    def __init__(self, slope, time_step, waveform=None):
         self.slope = slope  # V/ns
         self.time_step = time_step
+        # Non-linear ramp as (times, values) points, interpolated linearly and
+        # held at the last value; None is the linear ramp of the given slope
+        if waveform is not None:
+            times, values = waveform
+            if len(times) != len(values) or len(times) < 2:
+                raise ValueError("Ramp waveform needs at least two (time, voltage) points")
+            if np.any(np.diff(times) <= 0) or np.any(np.diff(values) < 0):
+                raise ValueError("Ramp waveform must rise monotonically over increasing times")
+            waveform = (tuple(map(float, times)), tuple(map(float, values)))
+        self.waveform = waveform
         self.current_value = 0
         self.enabled = False
         
@@ -15,17 +27,59 @@ class RampGenerator:
             
         # Convert time to nanoseconds since slope is in V/ns
         #time_ns = time * 1e9
-        self.current_value = self.slope * time_step
+        if self.waveform is not None:
+            self.current_value = float(self.values(time_step))
+        else:
+            self.current_value = self.slope * time_step
         return self.current_value
+
+    def time_grid(self, max_time, extra_steps=0):
+        """
+        Returns the times visited by the time-stepping loop, accumulated step by step
+        exactly as the loop does, up to the first step past max_time (plus extra_steps).
+        """
+        num_steps = int(max_time / self.time_step) + 3 + extra_steps
+        grid = np.concatenate(([0.0], np.cumsum(np.full(num_steps, float(self.time_step)))))
+        overflow_index = int(np.searchsorted(grid, max_time, side='right'))
+        return grid[:overflow_index + 1 + extra_steps]
+        
+    def values(self, times):
+        """
+        Ramp value at each of the given times, the vectorized get_value of an
+        enabled ramp.
+        """
+        if self.waveform is not None:
+            return np.interp(times, *self.waveform)
+        return self.slope * np.asarray(times, dtype=float)
+        
+    def crossing_index(self, reference, time_grid):
+        """
+        Closed-form crossing of the linear ramp with the reference (t = V/slope),
+        quantized to the first point of time_grid where the ramp reaches reference.
+        Returns len(time_grid) - 1 when the ramp does not cross within the grid.
+        """
+        reference = np.asarray(reference, dtype=float)
+        last = len(time_grid) - 1
+        index = np.clip(np.ceil(reference / (self.slope * self.time_step)), 0, last).astype(int)
+        # Accumulated time steps drift from k*time_step by rounding only, so the
+        # estimate is at most one grid point away from the loop's crossing
+        index = np.where((index < last) & (self.slope * time_grid[index] < reference), index + 1, index)
+        index = np.where((index > 0) & (self.slope * time_grid[index - 1] >= reference), index - 1, index)
+        return index
         
     def get_energy(self, time_step):
         if not self.enabled:
             return 0
         return 0.5 * self.slope * time_step * self.current_value
+    def get_activity_energy(self, active_time):
+        # Same as get_energy, with the ramp value reached after active_time
+        ramp_value = self.slope * active_time if self.waveform is None else self.values(active_time)
+        return 0.5 * self.slope * active_time * ramp_value
         
     def get_delay(self):
         return self.time_step
     def get_power(self):
         return 0.2
+    AREA = 0.3e-12
     def get_area(self):
-        return 0.3e-12
\ No newline at end of file
+        return self.AREA
\ No newline at end of file
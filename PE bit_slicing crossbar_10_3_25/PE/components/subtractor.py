@@ -10,6 +10,27 @@ class Subtractor:
         self.last_operation = (col1_output, col2_output)
 #        return col1_output - col2_output
         return col1_output - col2_output + self.sub_offset        
+
+    @staticmethod
+    def column_pairs(array_columns):
+        """
+        Number of subtractors (and comparators and TDCs) of an array: one per
+        column pair. Accepts NumPy arrays of column counts.
+        """
+        return array_columns // 2
+
+    @staticmethod
+    def subtract_pairs(column_pairs, sub_offset=0.0):
+        """
+        Vectorized subtract of all subtractors at once.
+        
+        Parameters:
+            column_pairs: Column outputs of shape (..., subtractors, 2)
+        
+        Returns:
+            numpy array of shape (..., subtractors)
+        """
+        return column_pairs[..., 0] - column_pairs[..., 1] + sub_offset
         
     def get_energy(self):
         """
@@ -17,6 +38,12 @@ class Subtractor:
         """
         return 0.3e-12 if self.last_operation else 0
         
+    def get_activity_energy(self, num_operations):
+        """
+        Returns the energy of num_operations subtractions.
+        """
+        return 0.3e-12 * num_operations
+        
     def get_delay(self):
         """
         Returns the delay of the subtractor.
@@ -24,5 +51,6 @@ class Subtractor:
         return 0.5e-9  # Fixed delay in ns
     def get_power(self):
         return 0.1
+    AREA = 0.3e-12
     def get_area(self):
-        return 0.3e-12
\ No newline at end of file
+        return self.AREA
\ No newline at end of file
@@ -1,3 +1,5 @@
+import numpy as np
+
 class TDC:
     def __init__(self, num_tdc, time_precision):
         self.num_tdc = num_tdc
@@ -8,6 +10,14 @@ class TDC:
         time_diff = stop_time - start_time
         digital_value = int(time_diff / self.time_precision) 
         return min(digital_value, 2**self.num_tdc - 1)
+    
+    def quantize(self, start_time, stop_time):
+        """
+        Vectorized measure_time for arrays of start and stop times.
+        """
+        time_diff = np.asarray(stop_time) - start_time
+        digital_value = np.trunc(time_diff / self.time_precision).astype(np.int64)
+        return np.minimum(digital_value, 2**self.num_tdc - 1)
         
     def get_energy(self, measurement_time):
         return 0.2 * measurement_time
@@ -16,5 +26,10 @@ class TDC:
         return self.time_precision
     def get_power(self):
         return 0.5* self.time_precision
+    # Area per bit of the counter, 0.1 for a 12-bit TDC
+    BIT_AREA = 0.1 / 12
+    @staticmethod
+    def area(num_tdc):
+        return TDC.BIT_AREA * num_tdc
     def get_area(self):
-        return 0.1
\ No newline at end of file
+        return self.area(self.num_tdc)
\ No newline at end of file
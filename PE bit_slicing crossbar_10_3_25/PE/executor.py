@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from tiling import TiledMVM
+
+# Per-worker state, set once by the pool initializer
+_worker = {}
+
+
+def _attach(name, shape, dtype):
+    """
+    Attach to a shared memory block and view it as a read-only array.
+    Pool workers share the resource tracker of the creating process, which
+    unlinks the block once the run is over.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    array.flags.writeable = False
+    return shm, array
+
+
+def _init_tiled(config_path, name, shape, dtype, num_inputs, num_outputs, blocks_per_step, nonideality):
+    shm, cells = _attach(name, shape, dtype)
+    _worker['shm'] = shm
+    _worker['tiled'] = TiledMVM.from_cells(config_path, cells, num_inputs, num_outputs, blocks_per_step)
+    _worker['tiled'].pe.crossbar.nonideality = nonideality
+
+
+def _init_system(system_class, config_path, name, shape, dtype, nonideality):
+    shm, weights = _attach(name, shape, dtype)
+    _worker['shm'] = shm
+    _worker['system'] = system_class(config_path)
+    _worker['system'].crossbar.nonideality = nonideality
+    _worker['system'].crossbar.weights = weights
+
+
+def _run_tiles(inputs, start, stop):
+    return _worker['tiled'].run_tiles(inputs, start, stop)
+
+
+def _process_batch(inputs, selected_rows):
+    system = _worker['system']
+    outputs, operation_times = system.process_batch(inputs, selected_rows)
+    return outputs, operation_times, system.last_energy, system.last_cycles
+
+
+class PEExecutor:
+    """
+    Runs independent PE tiles or batch shards on a process pool.
+
+    Crossbar weights are placed in shared memory once per run and attached
+    read-only by every worker instead of being pickled with each task. The
+    non-ideality engine of the crossbar, including one attached in code, is
+    passed to the workers with them. Shards
+    are merged in submission order, so results do not depend on which worker
+    finishes first.
+    """
+    def __init__(self, max_workers=None, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count()
+        self.mp_context = multiprocessing.get_context(mp_context) if isinstance(mp_context, str) else mp_context
+
+    def _pool(self, initializer, initargs):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.mp_context,
+                                   initializer=initializer, initargs=initargs)
+
+    @staticmethod
+    def _share(array):
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        return shm
+
+    @staticmethod
+    def _shards(total, num_shards):
+        bounds = np.linspace(0, total, min(num_shards, total) + 1).astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def run_tiled(self, tiled, inputs, split='tiles'):
+        """
+        Run a TiledMVM on the pool.
+
+        Parameters:
+            tiled: TiledMVM holding the weight matrix
+            inputs: numpy array of shape (batch, M)
+            split: 'tiles' to fan out column tiles, 'batch' to fan out batch shards
+
+        Returns:
+            Same as TiledMVM.run
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=np.int64))
+        if len(inputs) == 0:
+            # Nothing to fan out, the serial run handles the empty batch
+            return tiled.run(inputs)
+        shm = self._share(tiled.cells)
+        try:
+            initargs = (tiled.config_path, shm.name, tiled.cells.shape, tiled.cells.dtype,
+                        tiled.num_inputs, tiled.num_outputs, tiled.blocks_per_step,
+                        tiled.pe.crossbar.nonideality)
+            with self._pool(_init_tiled, initargs) as pool:
+                if split == 'tiles':
+                    shards = self._shards(tiled.column_tiles, self.max_workers)
+                    partials = list(pool.map(_run_tiles, [inputs] * len(shards),
+                                             *zip(*shards)))
+                    return tiled.merge(partials)
+                if split == 'batch':
+                    shards = self._shards(len(inputs), self.max_workers)
+                    partials = list(pool.map(_run_tiles, [inputs[start:stop] for start, stop in shards],
+                                             [0] * len(shards), [tiled.column_tiles] * len(shards)))
+                    # Per-sample arrays are concatenated, totals are summed
+                    return tiled.merge([{
+                        name: np.concatenate([partial[name] for partial in partials])
+                        if isinstance(value, np.ndarray) else sum(partial[name] for partial in partials)
+                        for name, value in partials[0].items()
+                    }])
+                raise ValueError(f"Unknown split '{split}', expected 'tiles' or 'batch'")
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def process_batch(self, system, inputs, selected_rows):
+        """
+        system.process_batch with the batch sharded across the pool. Works for
+        PWMSystem and QuantizedPWMSystem alike.
+        """
+        inputs = np.atleast_2d(np.asarray(inputs))
+        if len(inputs) == 0:
+            return system.process_batch(inputs, selected_rows)
+        weights = np.ascontiguousarray(system.crossbar.weights, dtype=float)
+        shm = self._share(weights)
+        try:
+            initargs = (type(system), system.config_path, shm.name, weights.shape, weights.dtype,
+                        system.crossbar.nonideality)
+            with self._pool(_init_system, initargs) as pool:
+                shards = self._shards(len(inputs), self.max_workers)
+                results = list(pool.map(_process_batch, [inputs[start:stop] for start, stop in shards],
+                                        [selected_rows] * len(shards)))
+        finally:
+            shm.close()
+            shm.unlink()
+        outputs = np.concatenate([result[0] for result in results])
+        operation_times = np.concatenate([result[1] for result in results])
+        system.last_energy = self._concatenate([result[2] for result in results])
+        system.last_cycles = self._concatenate([result[3] for result in results])
+        return outputs, operation_times
+
+    @classmethod
+    def _concatenate(cls, shards):
+        # Joins per-sample arrays (also inside nested dicts) of shards in order
+        first = shards[0]
+        if isinstance(first, dict):
+            return {name: cls._concatenate([shard[name] for shard in shards]) for name in first}
+        if isinstance(first, np.ndarray):
+            return np.concatenate(shards)
+        return first
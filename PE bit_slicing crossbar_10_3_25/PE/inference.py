@@ -0,0 +1,157 @@
+import numpy as np
+from layer_compiler import CompiledLayer
+from pipeline_metrics import PipelineMetrics
+
+
+def relu(x):
+    return np.maximum(x, 0)
+
+
+def flatten(x):
+    return x.reshape(len(x), -1)
+
+
+class InferenceRunner:
+    """
+    Runs a model end-to-end on the PE design.
+
+    The model is a sequence of stages: CompiledLayers from the LayerCompiler,
+    which run on their own group of PEs, and plain functions such as relu or
+    flatten, which run digitally between them. Activations flow through a chain
+    of generators one micro-batch at a time, so only one micro-batch per layer is
+    resident. The layer outputs are requantized to the input_bits of the next
+    layer, with scales fixed by calibrate() or else taken from each micro-batch.
+
+        runner = InferenceRunner([compiler.compile(Conv2d(w1)), relu, flatten,
+                                  compiler.compile(Linear(w2, b2))])
+        runner.calibrate(x[:64])
+        logits, report = runner.run(x, labels)
+    """
+    def __init__(self, stages, micro_batch=16, executor=None):
+        self.stages = list(stages)
+        self.micro_batch = micro_batch
+        self.executor = executor
+        # Stage index -> (input scale, input zero point) of each compiled layer
+        self.input_quantization = {}
+
+    @property
+    def layers(self):
+        return [(index, stage) for index, stage in enumerate(self.stages) if isinstance(stage, CompiledLayer)]
+
+    def calibrate(self, x):
+        """
+        Fix the input quantization of every layer from the activation ranges the
+        floating-point model produces on calibration data.
+        """
+        for index, stage in enumerate(self.stages):
+            if isinstance(stage, CompiledLayer):
+                rows, _ = stage.layer.lower(x)
+                _, scale, zero_point = stage.quantize_inputs(rows)
+                self.input_quantization[index] = (scale, zero_point)
+                x = stage.reference(x)
+            else:
+                x = stage(x)
+
+    def micro_batches(self, x):
+        for start in range(0, len(x), self.micro_batch):
+            yield x[start:start + self.micro_batch]
+
+    def _stage(self, index, stage, batches, reports):
+        for batch in batches:
+            if isinstance(stage, CompiledLayer):
+                scale, zero_point = self.input_quantization.get(index, (None, None))
+                batch, report = stage.run(batch, scale, zero_point, self.executor)
+                reports[index].append(report)
+            else:
+                batch = stage(batch)
+            yield batch
+
+    def stream(self, x, reports=None):
+        """
+        Generator of model outputs, one micro-batch at a time. The layer reports
+        of every micro-batch are appended to reports[stage index].
+        """
+        reports = {index: [] for index, _ in self.layers} if reports is None else reports
+        batches = self.micro_batches(x)
+        for index, stage in enumerate(self.stages):
+            batches = self._stage(index, stage, batches, reports)
+        return batches
+
+    def reference(self, x):
+        """Floating-point result of the model"""
+        for stage in self.stages:
+            x = stage.reference(x) if isinstance(stage, CompiledLayer) else stage(x)
+        return x
+
+    def run(self, x, labels=None):
+        """
+        Run the model on a batch of samples.
+
+        Parameters:
+            x: Model inputs, samples along the first axis
+            labels: Optional class labels for the top-1 accuracy
+
+        Returns:
+            y: Model outputs
+            report: Per-layer costs, layer-pipelined timing and accuracy
+        """
+        reports = {index: [] for index, _ in self.layers}
+        y = np.concatenate(list(self.stream(x, reports)))
+        report = self.schedule(reports, len(x))
+
+        reference = self.reference(x)
+        report['relative_error'] = float(np.linalg.norm(y - reference) / max(np.linalg.norm(reference), np.finfo(float).tiny))
+        if y.ndim == 2:
+            report['agreement'] = float(np.mean(y.argmax(axis=1) == reference.argmax(axis=1)))
+            if labels is not None:
+                report['accuracy'] = float(np.mean(y.argmax(axis=1) == np.asarray(labels)))
+                report['reference_accuracy'] = float(np.mean(reference.argmax(axis=1) == np.asarray(labels)))
+        return y, report
+
+    def schedule(self, reports, num_samples):
+        """
+        Layer-pipelined timing: every layer runs on its own PEs, so layer l + 1
+        works on micro-batch i while layer l works on micro-batch i + 1. Each
+        layer holds one micro-batch, as in PipelineMetrics.schedule.
+
+        Parameters:
+            reports: {stage index: [layer report per micro-batch]}
+            num_samples: Samples in the run
+
+        Returns:
+            Dictionary of per-layer totals, sequential and pipelined time and
+            inferences per second
+        """
+        layers = []
+        stage_times = {}
+        for index, stage in self.layers:
+            batch_reports = reports[index]
+            # The MVMs of a micro-batch stream through the pipelined PEs of the layer
+            stage_times[index] = np.array([report['stream_time'] for report in batch_reports])
+            layers.append({
+                'stage': index,
+                'layer': type(stage.layer).__name__,
+                'matrix': (stage.num_inputs, stage.num_outputs),
+                'num_pes': stage.num_pes,
+                'mvms': sum(report['mvms'] for report in batch_reports),
+                'cycles': sum(report['cycles'] for report in batch_reports),
+                'energy': sum(report['energy'] for report in batch_reports),
+                'time': float(stage_times[index].sum()),
+                'saturated_codes': sum(report['saturated_codes'] for report in batch_reports),
+            })
+        _, departure = PipelineMetrics.schedule(stage_times)
+        sequential_time = sum(layer['time'] for layer in layers)
+        makespan = float(departure[-1, -1])
+        energy = sum(layer['energy'] for layer in layers)
+        return {
+            'layers': layers,
+            'num_pes': sum(layer['num_pes'] for layer in layers),
+            'micro_batches': len(departure),
+            'energy': energy,
+            'energy_per_inference': energy / num_samples,
+            'sequential_time': sequential_time,
+            'pipelined_time': makespan,
+            'bottleneck_stage': max(layers, key=lambda layer: layer['time'])['stage'],
+            'inferences_per_second': num_samples / makespan,
+            'sequential_inferences_per_second': num_samples / sequential_time,
+        }
@@ -0,0 +1,306 @@
+import math
+import numpy as np
+from pe_config import PEConfig
+from PE_quantization import QuantizedPWMSystem
+from tiling import TiledMVM
+
+
+class Linear:
+    """
+    Fully connected layer, y = x @ weight.T + bias.
+
+    Parameters:
+        weight: numpy array of shape (out_features, in_features)
+        bias: Optional numpy array of shape (out_features,)
+    """
+    def __init__(self, weight, bias=None):
+        self.weight = np.asarray(weight, dtype=float)
+        if self.weight.ndim != 2:
+            raise ValueError("Linear weight must have shape (out_features, in_features)")
+        self.bias = None if bias is None else np.asarray(bias, dtype=float)
+
+    def matrix(self):
+        """Weights as an (inputs x outputs) matrix for the crossbars"""
+        return self.weight.T
+
+    def num_mvms(self, input_shape):
+        return math.prod(input_shape[:-1])
+
+    def lower(self, x):
+        """
+        Rows of the MVMs computing the layer, shape (mvms, inputs), and the
+        shape restore() needs.
+        """
+        x = np.asarray(x, dtype=float)
+        return x.reshape(-1, self.weight.shape[1]), x.shape[:-1]
+
+    def restore(self, y, shape):
+        return y.reshape(shape + (self.weight.shape[0],))
+
+
+class Conv2d:
+    """
+    2-D convolution on NCHW activations, lowered to an MVM with im2col.
+
+    Parameters:
+        weight: numpy array of shape (out_channels, in_channels, kernel_h, kernel_w)
+        bias: Optional numpy array of shape (out_channels,)
+        stride: int or (stride_h, stride_w)
+        padding: int or (pad_h, pad_w) of zeros on both sides
+    """
+    def __init__(self, weight, bias=None, stride=1, padding=0):
+        self.weight = np.asarray(weight, dtype=float)
+        if self.weight.ndim != 4:
+            raise ValueError("Conv2d weight must have shape (out_channels, in_channels, kernel_h, kernel_w)")
+        self.bias = None if bias is None else np.asarray(bias, dtype=float)
+        self.stride = (stride, stride) if np.isscalar(stride) else tuple(stride)
+        self.padding = (padding, padding) if np.isscalar(padding) else tuple(padding)
+
+    def matrix(self):
+        # im2col patches are ordered (channel, kernel row, kernel column)
+        return self.weight.reshape(self.weight.shape[0], -1).T
+
+    def output_size(self, height, width):
+        _, _, kernel_h, kernel_w = self.weight.shape
+        return ((height + 2 * self.padding[0] - kernel_h) // self.stride[0] + 1,
+                (width + 2 * self.padding[1] - kernel_w) // self.stride[1] + 1)
+
+    def num_mvms(self, input_shape):
+        return input_shape[0] * math.prod(self.output_size(*input_shape[2:]))
+
+    def lower(self, x):
+        """
+        im2col: one MVM row per output pixel, shape (batch * out_h * out_w, in_channels * kernel_h * kernel_w).
+        """
+        x = np.asarray(x, dtype=float)
+        if x.ndim != 4 or x.shape[1] != self.weight.shape[1]:
+            raise ValueError(f"Conv2d input must have shape (batch, {self.weight.shape[1]}, height, width)")
+        _, _, kernel_h, kernel_w = self.weight.shape
+        out_h, out_w = self.output_size(*x.shape[2:])
+        x = np.pad(x, ((0, 0), (0, 0), (self.padding[0],) * 2, (self.padding[1],) * 2))
+        windows = np.lib.stride_tricks.sliding_window_view(x, (kernel_h, kernel_w), axis=(2, 3))
+        windows = windows[:, :, ::self.stride[0], ::self.stride[1]][:, :, :out_h, :out_w]
+        # (batch, channels, out_h, out_w, kh, kw) -> (batch, out_h, out_w, channels, kh, kw)
+        patches = windows.transpose(0, 2, 3, 1, 4, 5).reshape(-1, self.matrix().shape[0])
+        return patches, (x.shape[0], out_h, out_w)
+
+    def restore(self, y, shape):
+        batch, out_h, out_w = shape
+        return y.reshape(batch, out_h, out_w, -1).transpose(0, 3, 1, 2)
+
+
+def quantize_affine(values, num_bits, axis=None):
+    """
+    Asymmetric quantization to unsigned num_bits integers, values ~ scale * (q - zero_point).
+    The range always includes 0, so zero is represented exactly.
+
+    Parameters:
+        values: numpy array to quantize
+        num_bits: Bits of the unsigned integer codes
+        axis: Axis along which every slice gets its own scale (None for one scale)
+
+    Returns:
+        q, scale, zero_point (scale and zero_point broadcast against values)
+    """
+    values = np.asarray(values, dtype=float)
+    reduce = None if axis is None else tuple(i for i in range(values.ndim) if i != axis % values.ndim)
+    low = np.minimum(values.min(axis=reduce, keepdims=True), 0)
+    high = np.maximum(values.max(axis=reduce, keepdims=True), 0)
+    max_code = (1 << num_bits) - 1
+    scale = (high - low) / max_code
+    scale = np.where(scale > 0, scale, 1.0)
+    zero_point = np.rint(-low / scale).astype(np.int64)
+    q = np.clip(np.rint(values / scale) + zero_point, 0, max_code).astype(np.int64)
+    return q, scale, zero_point
+
+
+def quantize_symmetric(values, num_bits, axis=None):
+    """
+    Symmetric quantization to signed integers of num_bits magnitude bits,
+    values ~ scale * q, for the signed weight mapping.
+
+    Returns:
+        q, scale, zero_point (all zero points are 0)
+    """
+    values = np.asarray(values, dtype=float)
+    reduce = None if axis is None else tuple(i for i in range(values.ndim) if i != axis % values.ndim)
+    max_code = (1 << num_bits) - 1
+    scale = np.abs(values).max(axis=reduce, keepdims=True) / max_code
+    scale = np.where(scale > 0, scale, 1.0)
+    q = np.clip(np.rint(values / scale), -max_code, max_code).astype(np.int64)
+    return q, scale, np.zeros(scale.shape, dtype=np.int64)
+
+
+class CompiledLayer:
+    """
+    A layer mapped onto tiled PEs.
+
+    The weights are quantized per output channel to weight_bits, bit-sliced into
+    cell_weight_bits cells and held by a TiledMVM. With the signed weight mapping
+    they are quantized symmetrically and negative weights use the second column
+    of each pair, otherwise with a zero point onto non-negative codes. Each PE only uses rows_per_pe
+    of its rows, so the column sums of a full input chunk stay within the TDC
+    range. Activations are quantized to input_bits and the zero points are
+    removed digitally after the integer MVMs.
+    """
+    def __init__(self, layer, config, rows_per_pe, batch_size):
+        self.layer = layer
+        self.rows_per_pe = rows_per_pe
+        self.batch_size = batch_size
+
+        matrix = layer.matrix()
+        self.num_inputs, self.num_outputs = matrix.shape
+        self.weight_bits = config.weight_bits
+        self.input_bits = config.input_bits
+        quantize = quantize_symmetric if config.weight_mapping == 'signed' else quantize_affine
+        q, scale, zero_point = quantize(matrix, self.weight_bits, axis=1)
+        self.weight_scale = scale[0]
+        self.weight_zero_point = zero_point[0]
+        self.weight_sums = q.sum(axis=0)
+
+        # Input m goes to row m % rows_per_pe of row tile m // rows_per_pe
+        self.row_tiles = math.ceil(self.num_inputs / rows_per_pe)
+        self.row_map = (np.arange(self.num_inputs) // rows_per_pe * config.array_rows
+                        + np.arange(self.num_inputs) % rows_per_pe)
+        spread = np.zeros((self.row_tiles * config.array_rows, self.num_outputs), dtype=np.int64)
+        spread[self.row_map] = q
+        self.tiled = TiledMVM(config, spread)
+
+    @property
+    def num_pes(self):
+        return self.tiled.num_pes
+
+    @property
+    def cycles_per_mvm(self):
+        return self.tiled.pe.cycles_per_mvm
+
+    def plan(self, input_shape):
+        """
+        Execution plan for activations of the given shape: the MVM rows are
+        streamed through the PEs in batches of batch_size.
+
+        Returns:
+            Dictionary with PE count, MVMs, micro-batches and crossbar cycles
+        """
+        return self._plan(self.layer.num_mvms(input_shape))
+
+    def _plan(self, num_mvms):
+        return {
+            'layer': type(self.layer).__name__,
+            'matrix': (self.num_inputs, self.num_outputs),
+            'num_pes': self.num_pes,
+            'row_tiles': self.row_tiles,
+            'column_tiles': self.tiled.column_tiles,
+            'rows_per_pe': self.rows_per_pe,
+            'mvms': num_mvms,
+            'batches': math.ceil(num_mvms / self.batch_size),
+            # All PEs of the layer run the input-chunk cycles of an MVM in lockstep
+            'cycles': num_mvms * self.cycles_per_mvm,
+        }
+
+    def quantize_inputs(self, x):
+        """Per-tensor input_bits quantization of activations"""
+        return quantize_affine(x, self.input_bits)
+
+    def run(self, x, input_scale=None, input_zero_point=None, executor=None):
+        """
+        Run the layer on a batch of activations.
+
+        Parameters:
+            x: Activations, (batch, in_features) for Linear, NCHW for Conv2d
+            input_scale, input_zero_point: Fixed input quantization, e.g. from
+                calibration; derived from x when not given
+            executor: Optional PEExecutor to run the tiles on a process pool
+
+        Returns:
+            y: Layer outputs in floating point
+            report: Dictionary of the plan plus measured energy, latency and saturated codes
+        """
+        rows, shape = self.layer.lower(x)
+        if input_scale is None:
+            q, input_scale, input_zero_point = self.quantize_inputs(rows)
+        else:
+            q = np.clip(np.rint(rows / input_scale) + input_zero_point, 0, (1 << self.input_bits) - 1).astype(np.int64)
+        acc, report = self.run_integer(q, executor)
+
+        # sum_m (q_m - zx)(w_mn - zw_n) from the crossbar result sum_m q_m w_mn
+        acc = (acc - self.weight_zero_point * q.sum(axis=1, keepdims=True)
+               - input_zero_point * self.weight_sums + self.num_inputs * input_zero_point * self.weight_zero_point)
+        y = acc * (input_scale * self.weight_scale)
+        if self.layer.bias is not None:
+            y = y + self.layer.bias
+        return self.layer.restore(y, shape), report
+
+    def run_integer(self, q, executor=None):
+        """
+        Integer MVMs of quantized input rows with the quantized weights,
+        batch_size rows at a time.
+
+        Returns:
+            acc: numpy array of shape (mvms, outputs)
+            report: Plan of the layer with measured energy, latency, pipelined
+                    stream time of the MVMs and saturated codes
+        """
+        report = self._plan(len(q))
+        acc = np.empty((len(q), self.num_outputs), dtype=np.int64)
+        energy = latency = stream_time = 0.0
+        saturated = 0
+        for start in range(0, len(q), self.batch_size):
+            stop = min(start + self.batch_size, len(q))
+            # Only one micro-batch of rows is spread onto the PE rows at a time
+            spread = np.zeros((stop - start, self.row_tiles * self.tiled.tile_rows), dtype=np.int64)
+            spread[:, self.row_map] = q[start:stop]
+            if executor is None:
+                acc[start:stop], batch_report = self.tiled.run(spread)
+            else:
+                acc[start:stop], batch_report = executor.run_tiled(self.tiled, spread)
+            energy += batch_report['energy']
+            latency += batch_report['latency']
+            stream_time += batch_report['pipeline']['makespan']
+            saturated += batch_report['saturated_codes']
+        report.update(energy=energy, latency=latency, stream_time=stream_time, saturated_codes=saturated)
+        return acc, report
+
+    def reference(self, x):
+        """Floating-point result of the layer, for accuracy checks"""
+        rows, shape = self.layer.lower(x)
+        y = rows @ self.layer.matrix()
+        if self.layer.bias is not None:
+            y = y + self.layer.bias
+        return self.layer.restore(y, shape)
+
+
+class LayerCompiler:
+    """
+    Lowers Linear and Conv2d layers onto PWMSystem crossbars.
+
+        compiler = LayerCompiler('config.ini')
+        layer = compiler.compile(Conv2d(weight, bias, padding=1))
+        print(layer.plan(x.shape))
+        y, report = layer.run(x)
+    """
+    def __init__(self, config_path, rows_per_pe=None, batch_size=1024):
+        self.config = PEConfig.load(config_path)
+        self.pe = QuantizedPWMSystem(self.config)
+        self.batch_size = batch_size
+        self.rows_per_pe = rows_per_pe or self.safe_rows_per_pe()
+        if not 1 <= self.rows_per_pe <= self.config.array_rows:
+            raise ValueError(f"rows_per_pe must be between 1 and {self.config.array_rows}")
+
+    def safe_rows_per_pe(self):
+        """
+        Most rows whose column sum of full input and weight chunks stays below
+        the largest TDC code after the subtractor offset, and with the signed
+        weight mapping also within the offset below zero.
+        """
+        max_code = 2**self.pe.tdc.num_tdc - 1
+        headroom = max_code - 1 - self.pe.output_offset
+        if self.config.weight_mapping == 'signed':
+            headroom = min(headroom, self.pe.output_offset)
+        max_product = ((1 << self.pe.chunk_size) - 1) * ((1 << self.pe.cell_weight_bits) - 1)
+        return int(np.clip(headroom // max_product, 1, self.config.array_rows))
+
+    def compile(self, layer):
+        if not isinstance(layer, (Linear, Conv2d)):
+            raise ValueError(f"Cannot compile {type(layer).__name__}, expected Linear or Conv2d")
+        return CompiledLayer(layer, self.config, self.rows_per_pe, self.batch_size)
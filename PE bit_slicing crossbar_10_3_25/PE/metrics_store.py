@@ -0,0 +1,157 @@
+import os
+from pathlib import Path
+import numpy as np
+
+
+class MetricsStore:
+    """
+    Columnar accumulator for per-sample metrics.
+
+    Every metric is a preallocated NumPy column (with trailing dimensions for
+    vector metrics such as the 16 output codes) that doubles its capacity when
+    full, so millions of samples cost one array per metric instead of one
+    dict per sample. Columns are created from the first rows added.
+
+    With a sink (.npz or .csv path) the rows can be flushed incrementally,
+    automatically every flush_size rows. Aggregates cover the rows currently
+    held in memory.
+    """
+    def __init__(self, capacity=1024, sink=None, flush_size=None):
+        self.capacity = capacity
+        self.sink = sink
+        self.flush_size = flush_size
+        self._columns = {}
+        self._size = 0
+        # Index of the next .npz part, found from the existing parts on the first flush
+        self._parts = None
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, name):
+        return self._columns[name][:self._size]
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def append(self, **values):
+        """
+        Adds one row, e.g. append(**system.calculate_metrics(t), codes=outputs).
+        """
+        self.extend(**{name: np.asarray(value)[None] for name, value in values.items()})
+
+    def extend(self, **columns):
+        """
+        Adds one row per element of the first dimension of every column.
+        Scalars are repeated for every row.
+        """
+        arrays = {name: np.asarray(values) for name, values in columns.items()}
+        num_rows = max((len(values) for values in arrays.values() if values.ndim), default=1)
+        arrays = {name: np.broadcast_to(values, (num_rows,) + values.shape[1:]) if values.ndim
+                  else np.full(num_rows, values) for name, values in arrays.items()}
+
+        if not self._columns:
+            self.capacity = max(self.capacity, num_rows)
+            self._columns = {name: np.empty((self.capacity,) + values.shape[1:], dtype=values.dtype)
+                             for name, values in arrays.items()}
+        elif set(arrays) != set(self._columns):
+            raise ValueError(f"Rows must have the columns {sorted(self._columns)}")
+
+        self._reserve(self._size + num_rows)
+        for name, values in arrays.items():
+            self._columns[name][self._size:self._size + num_rows] = values
+        self._size += num_rows
+
+        if self.sink and self.flush_size and self._size >= self.flush_size:
+            self.flush()
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return
+        while self.capacity < size:
+            self.capacity *= 2
+        for name, values in self._columns.items():
+            grown = np.empty((self.capacity,) + values.shape[1:], dtype=values.dtype)
+            grown[:self._size] = values[:self._size]
+            self._columns[name] = grown
+
+    def aggregate(self, name, percentiles=(50, 95, 99)):
+        """
+        Mean, spread and percentiles of a column over the rows in memory,
+        per element for vector columns.
+        """
+        values = self[name]
+        result = {
+            'mean': values.mean(axis=0),
+            'std': values.std(axis=0),
+            'min': values.min(axis=0),
+            'max': values.max(axis=0),
+        }
+        for q, value in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+            result[f'p{q}'] = value
+        return result
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """
+        aggregate() of every scalar column.
+        """
+        return {name: {stat: float(value) for stat, value in self.aggregate(name, percentiles).items()}
+                for name, values in self._columns.items() if values.ndim == 1}
+
+    def flush(self):
+        """
+        Writes the rows in memory to the sink and clears them. A .csv sink is
+        appended to (vector columns become name_0, name_1, ...); a .npz sink is
+        written as numbered parts next to it, which load() joins again. Parts
+        already on disk are kept, numbering continues after the highest one.
+        """
+        if not self.sink:
+            raise ValueError("MetricsStore has no sink to flush to")
+        if self._size:
+            path = Path(self.sink)
+            if path.suffix == '.csv':
+                self._write_csv(path)
+            elif path.suffix == '.npz':
+                if self._parts is None:
+                    self._parts = max((int(part.suffixes[-2][1:]) + 1 for part in self._part_paths(path)), default=0)
+                part = path.with_name(f"{path.stem}.{self._parts:05d}.npz")
+                np.savez(part, **{name: self[name] for name in self._columns})
+                self._parts += 1
+            else:
+                raise ValueError(f"Unknown sink format '{path.suffix}', expected .csv or .npz")
+        self.clear()
+
+    def _write_csv(self, path):
+        header = []
+        table = []
+        for name in self._columns:
+            values = self[name].reshape(self._size, -1)
+            header += [name] if self._columns[name].ndim == 1 else [f"{name}_{i}" for i in range(values.shape[1])]
+            table.append(values.astype(float))
+        new_file = not path.exists() or os.path.getsize(path) == 0
+        with open(path, 'a') as sink:
+            np.savetxt(sink, np.hstack(table), delimiter=',', fmt='%.17g',
+                       header=','.join(header) if new_file else '', comments='')
+
+    def clear(self):
+        self._size = 0
+
+    @staticmethod
+    def _part_paths(path):
+        return path.parent.glob(f"{path.stem}.[0-9]*.npz")
+
+    @staticmethod
+    def load(path):
+        """
+        Reads a flushed sink back into a {column: array} dict.
+        """
+        path = Path(path)
+        if path.suffix == '.csv':
+            table = np.genfromtxt(path, delimiter=',', names=True)
+            return {name: table[name] for name in table.dtype.names}
+        parts = sorted(MetricsStore._part_paths(path))
+        if not parts:
+            raise FileNotFoundError(f"No metrics parts found for {path}")
+        loaded = [np.load(part) for part in parts]
+        return {name: np.concatenate([part[name] for part in loaded]) for name in loaded[0].files}
@@ -0,0 +1,203 @@
+import copy
+import numpy as np
+from nonideality import NonIdealityEngine, ConductanceVariation, StuckAtFaults, IRDrop
+
+PERCENTILES = (1, 5, 50, 95, 99)
+
+
+class MonteCarlo:
+    """
+    Vectorized Monte Carlo of a PWMSystem over many fabricated instances (trials).
+
+    Every trial draws its own cell conductances from the crossbar's non-ideality
+    engine, whether built from the config or attached in code, with its
+    lognormal variation replaced by device_variation unless that is None,
+    a static input offset per comparator (volts), a relative slope mismatch of
+    its ramp and Gaussian TDC jitter on every crossing (seconds). A chunk of
+    trials runs as one (trials, batch, 16) tensor computation through the
+    subtractors and the shared-ramp sweep, and the trial axis is chunked so that
+    a chunk stays below max_bytes. Codes are compared with those of the nominal
+    system. Every trial draws from its own random streams, seeded by (seed,
+    trial index), so results do not depend on the chunk size.
+
+        mc = MonteCarlo(system, device_variation=0.05, comparator_offset=1e-4)
+        report = mc.run(inputs, selected_rows, trials=10000)
+    """
+    def __init__(self, system, device_variation=None, comparator_offset=0.0, slope_mismatch=0.0,
+                 tdc_jitter=0.0, tolerance=0, seed=0, max_bytes=64 * 2**20):
+        self.system = system
+        self.device_variation = device_variation
+        self.comparator_offset = comparator_offset
+        self.slope_mismatch = slope_mismatch
+        self.tdc_jitter = tdc_jitter
+        # Largest code error still counted as accurate
+        self.tolerance = tolerance
+        self.seed = seed
+        self.max_bytes = max_bytes
+
+    def chunk_trials(self, batch_size, num_rows):
+        """Trials per chunk keeping the float64 working set below max_bytes"""
+        columns = self.system.crossbar.array_columns
+        pairs = len(self.system.subtractors)
+        trial_bytes = 8 * (num_rows * columns + 2 * batch_size * columns + 8 * batch_size * pairs)
+        return max(1, int(self.max_bytes // trial_bytes))
+
+    def _device_engine(self):
+        """
+        Engine the trials draw their devices from: a copy of the crossbar's engine
+        with its variation stage set to device_variation (kept when None),
+        re-seeded per trial by sample_codes. Without an attached engine it comes
+        from the config.
+        """
+        attached = self.system.crossbar.nonideality
+        if attached is None:
+            config = self.system.config
+            if self.device_variation is not None:
+                config = config.replace(conductance_variation=self.device_variation)
+            return NonIdealityEngine.from_config(config)
+        engine = copy.copy(attached)
+        if self.device_variation is None:
+            return engine
+        engine.effects = [effect for effect in attached.effects if not isinstance(effect, ConductanceVariation)]
+        if self.device_variation > 0:
+            # Variation goes where from_config puts it, before faults and IR drop
+            position = next((i for i, effect in enumerate(engine.effects)
+                             if isinstance(effect, (StuckAtFaults, IRDrop))), len(engine.effects))
+            engine.effects.insert(position, ConductanceVariation(self.device_variation))
+        return engine
+
+    def sample_codes(self, inputs, selected_rows, start, stop):
+        """
+        Output codes of trials start..stop.
+
+        Parameters:
+            inputs: numpy array of shape (batch, len(selected_rows))
+            selected_rows: List of rows the inputs are applied to
+            start, stop: Range of trial indices, which select the random streams
+
+        Returns:
+            numpy array of TDC outputs, shape (stop - start, batch, 16)
+        """
+        system = self.system
+        rows = np.asarray(selected_rows, dtype=int)
+        num_trials = stop - start
+        streams = [np.random.SeedSequence([self.seed, trial]).spawn(2) for trial in range(start, stop)]
+        noise = [np.random.default_rng(noise_stream) for _, noise_stream in streams]
+
+        # Column outputs of every trial, shape (trials, batch, array_columns)
+        engine = self._device_engine()
+        weights = np.asarray(system.crossbar.weights, dtype=float)
+        if engine is None:
+            weights = weights[rows]
+            column_outputs = np.broadcast_to(system.crossbar.scaling_factor * (inputs @ weights),
+                                             (num_trials, len(inputs), weights.shape[1]))
+        else:
+            # Effects such as IR drop depend on the cell position, so the engine
+            # sees the whole array before the selected rows are taken
+            trial_weights = np.empty((num_trials, len(rows), weights.shape[1]))
+            for trial, (device_stream, _) in enumerate(streams):
+                engine.seed = int(device_stream.generate_state(1)[0])
+                trial_weights[trial] = engine.apply(weights)[rows]
+            column_outputs = system.crossbar.scaling_factor * np.einsum('bk,tkc->tbc', inputs, trial_weights)
+        thresholds = system.subtract_columns(column_outputs)
+
+        # A comparator offset shifts its threshold; a ramp scaled by (1 + mismatch)
+        # crosses v where the nominal ramp crosses v / (1 + mismatch)
+        num_pairs = thresholds.shape[-1]
+        if self.comparator_offset:
+            thresholds = thresholds + np.stack(
+                [rng.normal(0.0, self.comparator_offset, num_pairs) for rng in noise])[:, None, :]
+        if self.slope_mismatch:
+            thresholds = thresholds / (1 + np.array(
+                [rng.normal(0.0, self.slope_mismatch) for rng in noise]))[:, None, None]
+
+        stop_times, _ = system._sweep_crossings(thresholds)
+        crossed = stop_times < system.tdc.max_time
+        if self.tdc_jitter:
+            jitter = np.stack([rng.normal(0.0, self.tdc_jitter, stop_times.shape[1:]) for rng in noise])
+            stop_times = np.maximum(stop_times + jitter, 0)
+        return np.where(crossed, system.tdc.quantize(0, stop_times) - system.output_offset,
+                        2**system.tdc.num_tdc - 1)
+
+    def run(self, inputs, selected_rows, trials=10000):
+        """
+        Monte Carlo study of the system on a batch of input vectors.
+
+        Parameters:
+            inputs: numpy array of shape (batch, len(selected_rows)) of digital inputs
+            selected_rows: List of rows the inputs are applied to
+            trials: Number of fabricated instances to sample
+
+        Returns:
+            Dictionary with the distribution of code errors against the nominal
+            system, per-trial accuracy (fraction of codes within tolerance) and
+            RMS error, and their percentiles
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=float))
+        if inputs.shape[1] != len(selected_rows):
+            raise ValueError("Number of inputs must match number of selected rows")
+        nominal, _ = self.system.process_batch(inputs, selected_rows)
+
+        max_code = 2**self.system.tdc.num_tdc - 1
+        # Saturated codes skip the offset, so errors span +-(max_code + output_offset)
+        histogram = {}
+        accuracy = np.empty(trials)
+        rms_error = np.empty(trials)
+        max_abs_error = np.empty(trials, dtype=nominal.dtype)
+        saturated = 0
+        chunk_trials = self.chunk_trials(*inputs.shape)
+        for start in range(0, trials, chunk_trials):
+            stop = min(start + chunk_trials, trials)
+            codes = self.sample_codes(inputs, selected_rows, start, stop)
+            errors = (codes - nominal).reshape(stop - start, -1)
+            for value, count in zip(*np.unique(errors, return_counts=True)):
+                histogram[value.item()] = histogram.get(value.item(), 0) + int(count)
+            accuracy[start:stop] = np.mean(np.abs(errors) <= self.tolerance, axis=1)
+            rms_error[start:stop] = np.sqrt(np.mean(errors.astype(float)**2, axis=1))
+            max_abs_error[start:stop] = np.abs(errors).max(axis=1)
+            saturated += int(np.count_nonzero(codes == max_code))
+
+        histogram = dict(sorted(histogram.items()))
+        values = np.array(list(histogram))
+        counts = np.array(list(histogram.values()))
+        mean_error = float(np.sum(values * counts) / counts.sum())
+        return {
+            'trials': trials,
+            'samples': len(inputs),
+            'chunk_trials': chunk_trials,
+            'error_histogram': histogram,
+            'mean_error': mean_error,
+            'std_error': float(np.sqrt(np.sum((values - mean_error)**2 * counts) / counts.sum())),
+            'rms_error': float(np.sqrt(np.mean(rms_error**2))),
+            'max_abs_error': max_abs_error.max().item(),
+            'accuracy': float(accuracy.mean()),
+            'accuracy_percentiles': dict(zip(PERCENTILES, np.percentile(accuracy, PERCENTILES).tolist())),
+            'rms_error_percentiles': dict(zip(PERCENTILES, np.percentile(rms_error, PERCENTILES).tolist())),
+            'saturated_codes': saturated,
+            'trial_accuracy': accuracy,
+            'trial_rms_error': rms_error,
+            'trial_max_abs_error': max_abs_error,
+        }
+
+
+if __name__ == "__main__":
+    from pwm_system import PWMSystem
+
+    system = PWMSystem("config.ini")
+    rng = np.random.default_rng(0)
+    system.set_cells(rng.integers(0, 16, (32, 32)))
+    selected_rows = list(range(8))
+    inputs = rng.integers(0, 16, (64, 8))
+
+    # A comparator offset of 1 V pushes many trials past the TDC range, so
+    # saturated codes meet negative nominal codes at the ends of the histogram
+    monte_carlo = MonteCarlo(system, device_variation=0.05, comparator_offset=1.0,
+                             slope_mismatch=0.05, tdc_jitter=1e-9, tolerance=1)
+    report = monte_carlo.run(inputs, selected_rows, trials=1000)
+    errors = list(report['error_histogram'])
+    print(f"Trials: {report['trials']} in chunks of {report['chunk_trials']}")
+    print(f"Code errors: {min(errors)} to {max(errors)}, mean {report['mean_error']:.2f}, "
+          f"std {report['std_error']:.2f}, saturated codes {report['saturated_codes']}")
+    print(f"Accuracy percentiles: {report['accuracy_percentiles']}")
+    print(f"RMS error percentiles: {report['rms_error_percentiles']}")
+    assert sum(report['error_histogram'].values()) == report['trials'] * inputs.size // len(selected_rows) * 16
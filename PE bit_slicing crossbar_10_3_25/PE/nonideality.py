@@ -0,0 +1,113 @@
+import numpy as np
+
+
+class FiniteOnOff:
+    """
+    Finite Ron/Roff: a cell programmed to weight 0 still conducts 1/Roff, and
+    the programmed levels are spread between 1/Roff and 1/Ron.
+    """
+    def apply(self, conductance, engine, rng):
+        return engine.g_off + conductance * (engine.g_on - engine.g_off) / engine.g_on
+
+
+class ConductanceVariation:
+    """
+    Device-to-device variation: every cell's conductance is scaled by a
+    lognormal factor exp(N(0, sigma)).
+    """
+    def __init__(self, sigma):
+        self.sigma = sigma
+
+    def apply(self, conductance, engine, rng):
+        return conductance * rng.lognormal(0.0, self.sigma, conductance.shape)
+
+
+class StuckAtFaults:
+    """
+    Cells stuck at the on (1/Ron) or off (1/Roff) state, drawn at the given
+    rates or from an explicit fault map (1 stuck on, -1 stuck off, 0 healthy)
+    that broadcasts against the array.
+    """
+    def __init__(self, stuck_on_rate=0.0, stuck_off_rate=0.0, fault_map=None):
+        self.stuck_on_rate = stuck_on_rate
+        self.stuck_off_rate = stuck_off_rate
+        self.fault_map = fault_map
+
+    def apply(self, conductance, engine, rng):
+        if self.fault_map is not None:
+            faults = np.broadcast_to(self.fault_map, conductance.shape)
+        else:
+            draw = rng.random(conductance.shape)
+            faults = np.where(draw < self.stuck_on_rate, 1,
+                              np.where(draw < self.stuck_on_rate + self.stuck_off_rate, -1, 0))
+        return np.where(faults > 0, engine.g_on, np.where(faults < 0, engine.g_off, conductance))
+
+
+class IRDrop:
+    """
+    First-order wire IR drop. A cell at row i, column j sees the resistance of
+    j + 1 row-wire segments from its driver and array_rows - i column-wire
+    segments to the sense node, in series with the cell:
+    G_eff = G / (1 + G * R_wire).
+    """
+    def __init__(self, wire_resistance):
+        self.wire_resistance = wire_resistance
+
+    def apply(self, conductance, engine, rng):
+        rows, columns = conductance.shape[-2:]
+        segments = np.arange(1, columns + 1) + (rows - np.arange(rows))[:, None]
+        return conductance / (1 + conductance * self.wire_resistance * segments)
+
+
+class NonIdealityEngine:
+    """
+    Turns programmed cell weights into effective weights, the conductance each
+    cell really has expressed in the same units (1/Ron per full-scale weight).
+    The effects are applied in order on arrays of shape (..., rows, columns),
+    every leading index being a separate physical array, and the result is
+    precomputed once per weight matrix so the MVM stays a single product.
+
+    Random effects draw from their own stream of seed, so a cell keeps the same
+    device parameters whenever the weights are reprogrammed.
+    """
+    def __init__(self, effects, Ron, Roff, cell_weight_bits, seed=0):
+        self.effects = list(effects)
+        self.g_on = 1 / Ron
+        self.g_off = 1 / Roff
+        self.max_weight = (1 << cell_weight_bits) - 1
+        self.seed = seed
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Engine for the [NonIdeality] section of a PEConfig, or None when every
+        effect is off.
+        """
+        effects = []
+        if config.finite_on_off:
+            effects.append(FiniteOnOff())
+        if config.conductance_variation > 0:
+            effects.append(ConductanceVariation(config.conductance_variation))
+        if config.stuck_on_rate > 0 or config.stuck_off_rate > 0:
+            effects.append(StuckAtFaults(config.stuck_on_rate, config.stuck_off_rate))
+        if config.wire_resistance > 0:
+            effects.append(IRDrop(config.wire_resistance))
+        if not effects:
+            return None
+        return cls(effects, config.Ron, config.Roff, config.cell_weight_bits, config.nonideality_seed)
+
+    def apply(self, weights):
+        """
+        Effective weights of an array (or a stack of arrays) of programmed weights.
+
+        Parameters:
+            weights: numpy array of shape (..., rows, columns)
+
+        Returns:
+            numpy array of the same shape
+        """
+        conductance = np.asarray(weights, dtype=float) * (self.g_on / self.max_weight)
+        streams = np.random.SeedSequence(self.seed).spawn(len(self.effects))
+        for effect, stream in zip(self.effects, streams):
+            conductance = effect.apply(conductance, self, np.random.default_rng(stream))
+        return conductance * (self.max_weight / self.g_on)
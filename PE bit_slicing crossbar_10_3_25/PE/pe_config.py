@@ -0,0 +1,160 @@
+import configparser
+import dataclasses
+from dataclasses import dataclass
+
+# Field name -> (INI section, INI option, type, fallback); fallback None means required
+FIELDS = {
+    'Vdd': ('System', 'Vdd', float, None),
+    'time_step': ('System', 'time_step', float, None),
+    'num_bits': ('DAC', 'num_bits', int, None),
+    'pulse_period': ('DAC', 'pulse_period', float, None),
+    'vin': ('Crossbar', 'vin', float, None),
+    'Ron': ('Crossbar', 'Ron', float, None),
+    'Roff': ('Crossbar', 'Roff', float, None),
+    'on_off_ratio': ('Crossbar', 'on_off_ratio', float, None),
+    'capacitance': ('Crossbar', 'capacitance', float, None),
+    'array_rows': ('Crossbar', 'array_rows', int, None),
+    'array_columns': ('Crossbar', 'array_columns', int, None),
+    'A': ('Crossbar', 'A', float, None),
+    'cell_weight_bits': ('Crossbar', 'cell_weight_bits', int, None),
+    'weight_mapping': ('Crossbar', 'weight_mapping', str, 'unsigned'),
+    'slope': ('RampGenerator', 'slope', float, None),
+    'crossing_mode': ('RampGenerator', 'crossing_mode', str, 'sweep'),
+    'ramp_waveform': ('RampGenerator', 'waveform', str, ''),
+    'num_tdc': ('TDC', 'num_tdc', int, None),
+    'time_precision': ('TDC', 'time_precision', float, None),
+    'sub_offset': ('Subtractor', 'sub_offset', str, None),
+    'weight_bits': ('Quantization', 'weight_bits', int, 16),
+    'input_bits': ('Quantization', 'input_bits', int, 16),
+    'chunk_size': ('Quantization', 'chunk_size', int, 4),
+    'finite_on_off': ('NonIdeality', 'finite_on_off', int, 0),
+    'conductance_variation': ('NonIdeality', 'conductance_variation', float, 0.0),
+    'stuck_on_rate': ('NonIdeality', 'stuck_on_rate', float, 0.0),
+    'stuck_off_rate': ('NonIdeality', 'stuck_off_rate', float, 0.0),
+    'wire_resistance': ('NonIdeality', 'wire_resistance', float, 0.0),
+    'nonideality_seed': ('NonIdeality', 'seed', int, 0),
+    'trace_level': ('Trace', 'level', str, 'off'),
+    'trace_sink': ('Trace', 'sink', str, ''),
+}
+
+CROSSING_MODES = ('analytic', 'stepping', 'event', 'sweep')
+WEIGHT_MAPPINGS = ('unsigned', 'signed')
+
+
+@dataclass(frozen=True, slots=True)
+class PEConfig:
+    """
+    Parsed PE configuration.
+
+    Every value is converted once when the config is built, so the simulator
+    reads plain attributes instead of going through configparser. Build it with
+    PEConfig.load from an INI path, a {section: {option: value}} dict, a
+    ConfigParser or another PEConfig; keyword overrides use the field names.
+    """
+    Vdd: float
+    time_step: float
+    num_bits: int
+    pulse_period: float
+    vin: float
+    Ron: float
+    Roff: float
+    on_off_ratio: float
+    capacitance: float
+    array_rows: int
+    array_columns: int
+    A: float
+    cell_weight_bits: int
+    slope: float
+    num_tdc: int
+    time_precision: float
+    sub_offset: str    # volts, or auto to derive it from the weight mapping
+    weight_mapping: str = 'unsigned'
+    crossing_mode: str = 'sweep'
+    ramp_waveform: str = ''
+    weight_bits: int = 16
+    input_bits: int = 16
+    chunk_size: int = 4
+    finite_on_off: int = 0
+    conductance_variation: float = 0.0
+    stuck_on_rate: float = 0.0
+    stuck_off_rate: float = 0.0
+    wire_resistance: float = 0.0
+    nonideality_seed: int = 0
+    trace_level: str = 'off'
+    trace_sink: str = ''
+
+    def __post_init__(self):
+        # Coerce overrides such as Ron=4000 or num_tdc='12' to the field type
+        for name, (_, _, kind, _) in FIELDS.items():
+            value = getattr(self, name)
+            if not isinstance(value, kind) or isinstance(value, bool):
+                object.__setattr__(self, name, kind(value))
+        if self.crossing_mode not in CROSSING_MODES:
+            raise ValueError(f"Unknown crossing_mode '{self.crossing_mode}', expected one of {CROSSING_MODES}")
+        if self.weight_mapping not in WEIGHT_MAPPINGS:
+            raise ValueError(f"Unknown weight_mapping '{self.weight_mapping}', expected one of {WEIGHT_MAPPINGS}")
+        if self.sub_offset != 'auto':
+            try:
+                float(self.sub_offset)
+            except ValueError:
+                raise ValueError(f"sub_offset must be a voltage or 'auto', got '{self.sub_offset}'")
+
+    @classmethod
+    def load(cls, source, **overrides):
+        """
+        Build a config from any supported source.
+
+        Parameters:
+            source: INI file path, dict, ConfigParser or PEConfig
+            overrides: Field values replacing those of the source
+
+        Returns:
+            PEConfig
+        """
+        if isinstance(source, PEConfig):
+            return source.replace(**overrides) if overrides else source
+        if isinstance(source, configparser.ConfigParser):
+            return cls.from_parser(source, **overrides)
+        if isinstance(source, dict):
+            return cls.from_dict(source, **overrides)
+        return cls.from_ini(source, **overrides)
+
+    @classmethod
+    def from_ini(cls, config_path, **overrides):
+        config = configparser.ConfigParser()
+        if not config.read(config_path):
+            raise FileNotFoundError(f"Config file not found at {config_path}")
+        return cls.from_parser(config, **overrides)
+
+    @classmethod
+    def from_dict(cls, sections, **overrides):
+        """
+        Build a config from a {section: {option: value}} dict. Option names are
+        case-insensitive, as in the INI file.
+        """
+        lowered = {section: {str(option).lower(): value for option, value in options.items()}
+                   for section, options in sections.items()}
+        values = {}
+        for name, (section, option, _, fallback) in FIELDS.items():
+            value = lowered.get(section, {}).get(option.lower(), fallback)
+            if value is None:
+                raise ValueError(f"Missing option '{option}' in section [{section}]")
+            values[name] = value
+        values.update(overrides)
+        return cls(**values)
+
+    @classmethod
+    def from_parser(cls, config, **overrides):
+        return cls.from_dict({section: dict(config[section]) for section in config.sections()}, **overrides)
+
+    def replace(self, **overrides):
+        return dataclasses.replace(self, **overrides)
+
+    def to_dict(self):
+        """
+        {section: {option: value}} form of the config, as read from an INI file.
+        """
+        sections = {}
+        for name, (section, option, _, _) in FIELDS.items():
+            sections.setdefault(section, {})[option.lower()] = str(getattr(self, name))
+        return sections
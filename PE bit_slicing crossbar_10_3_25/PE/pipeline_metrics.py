@@ -0,0 +1,99 @@
+import numpy as np
+
+class PipelineMetrics:
+    """
+    Timing of a stream of crossbar cycles through the PE, with DAC pulse
+    generation, crossbar integration, subtraction and ramp/TDC conversion as
+    pipeline stages. Each stage holds one cycle and takes the next as soon as
+    it has handed the previous one on, so successive input vectors and
+    bit-slice cycles overlap but a fast stage cannot run ahead of a slow one.
+    """
+    def __init__(self, system_components):
+        self.components = system_components
+
+    def stage_times(self, pulse_widths, conversion_times):
+        """
+        Time every stage spends on each cycle.
+
+        Parameters:
+            pulse_widths: Longest input pulse of each cycle, shape (cycles,)
+            conversion_times: Ramp time until the last crossing of each cycle, shape (cycles,)
+
+        Returns:
+            Dictionary of stage name to per-cycle times, in pipeline order
+        """
+        conversion_times = np.asarray(conversion_times, dtype=float).ravel()
+        pulse_widths = np.broadcast_to(np.asarray(pulse_widths, dtype=float).ravel(), conversion_times.shape)
+        subtractor_delay = max(subtractor.get_delay() for subtractor in self.components['subtractors'])
+        return {
+            'dac': np.full(conversion_times.shape, self.components['dac'].get_delay()),
+            # Columns integrate while the pulses are applied, then settle
+            'crossbar': pulse_widths + self.components['crossbar'].get_delay(),
+            'subtractor': np.full(conversion_times.shape, subtractor_delay),
+            'conversion': conversion_times + self.components['tdc'].get_delay(),
+        }
+
+    @staticmethod
+    def schedule(stage_times):
+        """
+        Time each cycle starts on and leaves each stage, from an empty pipeline at
+        t = 0. Cycle i starts on stage s once it has left stage s - 1 and cycle
+        i - 1 has left stage s, and leaves once done and cycle i - 1 has left
+        stage s + 1.
+
+        Returns:
+            start_times, departure_times: numpy arrays of shape (cycles, stages)
+        """
+        times = np.stack(list(stage_times.values()), axis=1).tolist()
+        num_stages = len(stage_times)
+        start = np.empty((len(times), num_stages))
+        departure = np.empty((len(times), num_stages))
+        previous = [0.0] * (num_stages + 1)
+        for i, cycle_times in enumerate(times):
+            current = [0.0] * (num_stages + 1)
+            arrival = 0.0
+            for s in range(num_stages):
+                start[i, s] = max(arrival, previous[s])
+                current[s] = arrival = max(start[i, s] + cycle_times[s], previous[s + 1])
+            departure[i] = current[:num_stages]
+            previous = current
+        return start, departure
+
+    def calculate_pipeline(self, stage_times, departure, cycles_per_mvm=1, macs_per_mvm=0):
+        """
+        Throughput and latency of a stream of cycles, cycles_per_mvm consecutive
+        cycles (e.g. input bit slices) making up one matrix-vector multiplication.
+
+        Parameters:
+            stage_times: Per-cycle stage times, from stage_times
+            departure: Departure times of the cycles, from schedule
+
+        Returns:
+            Dictionary of steady-state and measured stream timing
+        """
+        num_cycles = departure.shape[0]
+        if num_cycles == 0:
+            raise ValueError("Pipeline needs at least one cycle")
+        num_mvms = num_cycles / cycles_per_mvm
+
+        # In steady state a new cycle enters every time the slowest stage frees up
+        mean_stage_times = {name: float(times.mean()) for name, times in stage_times.items()}
+        bottleneck = max(mean_stage_times, key=mean_stage_times.get)
+        initiation_interval = mean_stage_times[bottleneck]
+        mvms_per_second = 1 / (initiation_interval * cycles_per_mvm)
+
+        makespan = float(departure[-1, -1])
+        # The last cycle enters the DAC stage once the cycle before it has left
+        last_entry = float(departure[-2, 0]) if num_cycles > 1 else 0.0
+        return {
+            'stage_times': mean_stage_times,
+            'bottleneck': bottleneck,
+            'initiation_interval': initiation_interval,
+            'mvm_interval': initiation_interval * cycles_per_mvm,
+            'fill_latency': float(departure[cycles_per_mvm - 1, -1]) if cycles_per_mvm <= num_cycles else makespan,
+            'drain_latency': makespan - last_entry,
+            'makespan': makespan,
+            'mvms_per_second': mvms_per_second,
+            'tops': 2 * macs_per_mvm * mvms_per_second / 1e12,
+            'stream_mvms_per_second': num_mvms / makespan,
+        }
@@ -1,17 +1,105 @@
+import numpy as np
+
+# Pipeline stage in which each component spends its energy
+COMPONENT_STAGES = {
+    'dac': 'dac',
+    'crossbar': 'crossbar',
+    'subtractors': 'subtractor',
+    'ramp_generator': 'conversion',
+    'comparator': 'conversion',
+    'tdc': 'conversion',
+}
+
 class PowerMetrics:
     def __init__(self, system_components):
         self.components = system_components
-        
-    def calculate_power(self):
-        """Calculate total delay for the system"""
-        # For subtractors, take the maximum delay since they operate in parallel
-        subtractors_power = max(subtractor.get_power() for subtractor in self.components['subtractors'])
-        
-        return sum([
-            self.components['dac'].get_power(),
-            self.components['crossbar'].get_power(),
-            subtractors_power,  # Use the maximum delay from subtractors
-            self.components['ramp_generator'].get_power(),
-            self.components['comparator'].get_power(),
-            self.components['tdc'].get_power()
-        ])
\ No newline at end of file
+
+    def calculate_power(self, energy, stage_times, start_times, bin_width=None):
+        """
+        Average and peak power of a pipelined stream of cycles. The energy of each
+        component in a cycle is spread evenly over the time its pipeline stage
+        spends on that cycle, and the result is binned into a power trace.
+
+        Parameters:
+            energy: {component: energy per cycle}, shape (cycles,) or (cycles, num_pes)
+            stage_times: {stage: time per cycle}, as from PipelineMetrics.stage_times
+            start_times: Start of every cycle on every stage, shape (cycles, stages)
+            bin_width: Trace resolution in seconds, defaults to the initiation interval
+
+        Returns:
+            Dictionary with the trace, the average and peak power per component and
+            in total, and the average and peak power of every PE
+        """
+        windows = {}
+        for s, (stage, times) in enumerate(stage_times.items()):
+            windows[stage] = (start_times[:, s], start_times[:, s] + times)
+        makespan = max(float(end.max()) for _, end in windows.values())
+        if bin_width is None:
+            bin_width = max(float(times.mean()) for times in stage_times.values())
+        edges = np.arange(int(np.ceil(makespan / bin_width)) + 1) * bin_width
+
+        # Per-component traces, summed over the PEs
+        trace = {}
+        for component, stage in COMPONENT_STAGES.items():
+            cycle_energy = np.asarray(energy[component], dtype=float)
+            cycle_energy = cycle_energy.reshape(len(cycle_energy), -1).sum(axis=1)
+            trace[component] = self.bin_energy(edges, *windows[stage], cycle_energy[:, None])[:, 0] / bin_width
+        trace['total'] = sum(trace.values())
+
+        # Per-PE traces, a block of PEs at a time to bound memory
+        num_cycles = len(start_times)
+        pe_energy = {component: np.asarray(energy[component], dtype=float).reshape(num_cycles, -1)
+                     for component in COMPONENT_STAGES}
+        num_pes = max(values.shape[1] for values in pe_energy.values())
+        pe_energy = {component: np.broadcast_to(values, (num_cycles, num_pes))
+                     for component, values in pe_energy.items()}
+        block = max(1, 2**22 // (2 * num_cycles))
+        pe_peak = np.empty(num_pes)
+        for first in range(0, num_pes, block):
+            pe_trace = 0
+            for component, stage in COMPONENT_STAGES.items():
+                values = pe_energy[component][:, first:first + block]
+                pe_trace = pe_trace + self.bin_energy(edges, *windows[stage], values)
+            pe_peak[first:first + block] = pe_trace.max(axis=0) / bin_width
+        pe_total = sum(values.sum(axis=0) for values in pe_energy.values())
+
+        return {
+            'bin_width': bin_width,
+            'times': edges[:-1],
+            'trace': trace,
+            'average': {name: float(values.sum() * bin_width / makespan) for name, values in trace.items()},
+            'peak': {name: float(values.max()) for name, values in trace.items()},
+            'num_pes': num_pes,
+            'pe_average': pe_total / makespan,
+            'pe_peak': pe_peak,
+        }
+
+    @staticmethod
+    def bin_energy(edges, start, end, energy):
+        """
+        Energy falling into each bin when energy[i] is spent evenly over
+        [start[i], end[i]). The cumulative energy is piecewise linear in time,
+        so it is built once at the sorted interval ends and read off at the edges.
+
+        Parameters:
+            edges: Bin edges, shape (bins + 1,)
+            start, end: Interval bounds, shape (intervals,)
+            energy: Energy per interval, shape (intervals, k)
+
+        Returns:
+            numpy array of shape (bins, k)
+        """
+        rate = energy / np.maximum(end - start, np.finfo(float).tiny)[:, None]
+        times = np.concatenate((start, end))
+        order = np.argsort(times, kind='stable')
+        times = times[order]
+        slope = np.cumsum(np.concatenate((rate, -rate))[order], axis=0)
+        cumulative = np.zeros_like(slope)
+        cumulative[1:] = np.cumsum(slope[:-1] * np.diff(times)[:, None], axis=0)
+
+        index = np.searchsorted(times, edges, side='right') - 1
+        before = index < 0
+        index = np.maximum(index, 0)
+        at_edges = cumulative[index] + slope[index] * (edges - times[index])[:, None]
+        at_edges[before] = 0
+        return np.diff(at_edges, axis=0)
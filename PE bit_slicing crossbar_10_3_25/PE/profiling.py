@@ -0,0 +1,141 @@
+import time
+import numpy as np
+
+# Methods wrapped on the system and on each component when a profiler is attached
+SYSTEM_METHODS = ('process_inputs', 'process_batch', 'convert_columns',
+                  '_stepping_crossings', '_analytic_crossings', '_event_crossings',
+                  '_sweep_crossings')
+COMPONENT_METHODS = {
+    'dac': ('convert',),
+    'crossbar': ('mvm', 'compute_output', 'sum_odd_column'),
+    'subtractors': ('subtract',),
+    'ramp_generator': ('get_value', 'crossing_index'),
+    'comparator': ('compare',),
+    'tdc': ('measure_time', 'quantize'),
+}
+
+
+class Profiler:
+    """
+    Opt-in call counts and wall time for the methods of a PWMSystem and its
+    components, plus ramp loop iterations per column.
+
+    attach() shadows the methods of the given instances with timing wrappers
+    and detach() removes them again, so a system that was never attached runs
+    its original methods untouched. Usable as a context manager:
+
+        with Profiler().attach(system) as profiler:
+            system.process_batch(inputs, rows)
+        print(profiler.table())
+    """
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stats = {}             # call stack tuple -> [calls, total time, time in children]
+        self.ramp_iterations = None  # per column, summed over all conversions
+        self._stack = []
+        self._wrapped = []
+
+    def attach(self, system):
+        self._system = system
+        system_name = type(system).__name__
+        for name in SYSTEM_METHODS:
+            on_return = self._count_iterations if name.endswith('_crossings') else None
+            self._wrap(system, name, f"{system_name}.{name}", on_return)
+        for key, names in COMPONENT_METHODS.items():
+            instances = system.components[key]
+            for instance in instances if isinstance(instances, list) else [instances]:
+                for name in names:
+                    if hasattr(instance, name):
+                        self._wrap(instance, name, f"{type(instance).__name__}.{name}")
+        return self
+
+    def detach(self):
+        for instance, name in self._wrapped:
+            del instance.__dict__[name]
+        self._wrapped = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+    def _wrap(self, instance, name, label, on_return=None):
+        method = getattr(instance, name)
+        stack = self._stack
+        stats = self.stats
+        clock = self.clock
+
+        def timed(*args, **kwargs):
+            stack.append(label)
+            start = clock()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                entry = stats.setdefault(tuple(stack), [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                stack.pop()
+                if stack:
+                    stats.setdefault(tuple(stack), [0, 0.0, 0.0])[2] += elapsed
+            if on_return is not None:
+                on_return(result)
+            return result
+
+        setattr(instance, name, timed)
+        self._wrapped.append((instance, name))
+
+    def _count_iterations(self, crossings):
+        # A column took one ramp step per grid point up to its end time, and
+        # one more comparison if the ramp crossed there
+        stop_times, end_times = (np.asarray(times, dtype=float) for times in crossings)
+        index = np.searchsorted(self._system.time_grid, end_times)
+        crossed = stop_times < self._system.tdc.max_time
+        iterations = (index + crossed).reshape(-1, end_times.shape[-1]).sum(axis=0)
+        self.ramp_iterations = iterations if self.ramp_iterations is None else self.ramp_iterations + iterations
+
+    def records(self):
+        """
+        Per-method totals over all call stacks, slowest first.
+
+        Returns:
+            List of dicts with method, calls, total_time, self_time and time_per_call
+        """
+        totals = {}
+        for stack, (calls, total, children) in self.stats.items():
+            entry = totals.setdefault(stack[-1], [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += total
+            entry[2] += total - children
+        rows = [{'method': method, 'calls': calls, 'total_time': total, 'self_time': self_time,
+                 'time_per_call': total / calls if calls else 0.0}
+                for method, (calls, total, self_time) in totals.items()]
+        return sorted(rows, key=lambda row: row['total_time'], reverse=True)
+
+    def table(self):
+        """Report as a fixed-width text table"""
+        lines = [f"{'method':<36}{'calls':>12}{'total s':>14}{'self s':>14}{'us/call':>12}"]
+        for row in self.records():
+            lines.append(f"{row['method']:<36}{row['calls']:>12}{row['total_time']:>14.6f}"
+                         f"{row['self_time']:>14.6f}{row['time_per_call'] * 1e6:>12.3f}")
+        if self.ramp_iterations is not None:
+            lines.append(f"ramp iterations per column: {self.ramp_iterations.tolist()}")
+        return '\n'.join(lines)
+
+    def write_table(self, path):
+        with open(path, 'w') as f:
+            f.write(self.table() + '\n')
+
+    def write_collapsed(self, path):
+        """
+        Writes the self time of every call stack in microseconds, in the
+        collapsed-stack format read by flamegraph.pl and speedscope.
+        """
+        with open(path, 'w') as f:
+            for stack, (_, total, children) in sorted(self.stats.items()):
+                f.write(f"{';'.join(stack)} {max(int(round((total - children) * 1e6)), 0)}\n")
+
+    def clear(self):
+        self.stats.clear()
+        self.ramp_iterations = None
@@ -1,4 +1,4 @@
-import configparser
+import heapq
 from pathlib import Path
 import numpy as np
 from components.dac import DAC
@@ -11,57 +11,104 @@ from Energy_metrics import EnergyMetrics
 from delay_metrics import DelayMetrics
 from power_metrics import PowerMetrics
 from Area_metrics import AreaMetrics
+from pipeline_metrics import PipelineMetrics
+from tracing import Tracer, SUMMARY, COLUMN, TIMESTEP
+from pe_config import PEConfig
+from ramp_table import ramp_table, load_waveform
+from nonideality import NonIdealityEngine
 
 class PWMSystem:
+    # Automatic subtractor offset of the unsigned mapping, 0.3 V at the default
+    # scaling factor of 0.0006 V per code
+    UNSIGNED_OFFSET_CODES = 500
+    
     def __init__(self, config_path):
+        self.config_path = config_path
         self.config = self._load_config(config_path)
-        self.num_bits = self.config.getint('DAC', 'num_bits')
+        self.num_bits = self.config.num_bits
+        # One crossbar cycle per input vector, producing one output per subtractor
+        self.cycles_per_mvm = 1
         self._initialize_components()
         self._initialize_metrics()
         
     def _load_config(self, config_path):
-        config = configparser.ConfigParser()
-        if not config.read(config_path):
-            raise FileNotFoundError(f"Config file not found at {config_path}")
-        return config
+        """
+        Load the configuration from an INI file path, or from an in-memory
+        PEConfig, ConfigParser or {section: {option: value}} dict.
+        """
+        return PEConfig.load(config_path)
         
     def _initialize_components(self):
+        # Trace events replace printing on the hot path, off unless configured
+        self.tracer = Tracer(
+            level=self.config.trace_level,
+            sink=self.config.trace_sink or None
+        )
+        
         # Initialize all components with configuration parameters
         self.dac = DAC(
-            num_bits=self.config.getint('DAC', 'num_bits'),
-            pulse_period=self.config.getfloat('DAC', 'pulse_period'),
-            Vdd=self.config.getfloat('System', 'Vdd')
+            num_bits=self.config.num_bits,
+            pulse_period=self.config.pulse_period,
+            Vdd=self.config.Vdd
         )
         
         self.crossbar = Crossbar(
-            Ron=self.config.getfloat('Crossbar', 'Ron'),
-            Roff=self.config.getfloat('Crossbar', 'Roff'),
-            on_off_ratio=self.config.getfloat('Crossbar', 'on_off_ratio'),
-            capacitance=self.config.getfloat('Crossbar', 'capacitance'),
-            Vdd=self.config.getfloat('System', 'Vdd'),
-            pulse_period=self.config.getfloat('DAC', 'pulse_period'),
-            array_rows=self.config.getint('Crossbar', 'array_rows'),
-            array_columns=self.config.getint('Crossbar', 'array_columns'),
-            A=self.config.getfloat('Crossbar', 'A'),
-            cell_weight_bits=self.config.getint('Crossbar', 'cell_weight_bits'),
-            vin=self.config.getfloat('Crossbar', 'vin')
+            Ron=self.config.Ron,
+            Roff=self.config.Roff,
+            on_off_ratio=self.config.on_off_ratio,
+            capacitance=self.config.capacitance,
+            Vdd=self.config.Vdd,
+            pulse_period=self.config.pulse_period,
+            array_rows=self.config.array_rows,
+            array_columns=self.config.array_columns,
+            A=self.config.A,
+            cell_weight_bits=self.config.cell_weight_bits,
+            vin=self.config.vin,
+            tracer=self.tracer,
+            nonideality=NonIdealityEngine.from_config(self.config)
         )
         
-        # Initialize 16 subtractors
-        sub_offset = self.config.getfloat('Subtractor', 'sub_offset')
-        self.subtractors = [Subtractor(sub_offset) for _ in range(16)]
+        # Offset lifting negative differences into the ramp range, in TDC codes.
+        # auto centres it in the TDC range for the signed mapping, so outputs span
+        # about +-2**(num_tdc - 1); unsigned outputs are mostly positive and keep
+        # the small offset the design was tuned with
+        if self.config.sub_offset == 'auto':
+            if self.config.weight_mapping == 'signed':
+                self.output_offset = 2**(self.config.num_tdc - 1)
+            else:
+                self.output_offset = self.UNSIGNED_OFFSET_CODES
+            self.sub_offset = self.output_offset * self.crossbar.scaling_factor
+        else:
+            self.sub_offset = float(self.config.sub_offset)
+            self.output_offset = self.sub_offset / self.crossbar.scaling_factor
+        
+        # One subtractor per column pair, 16 for the 32-column array
+        self.subtractors = [Subtractor(self.sub_offset) for _ in range(Subtractor.column_pairs(self.config.array_columns))]
+        # unsigned: cell weights as given; signed: differential mapping onto the column pairs
+        self.weight_mapping = self.config.weight_mapping
 #        self.subtractors = [Subtractor() for _ in range(16)]
         
         self.ramp_generator = RampGenerator(
-            slope=self.config.getfloat('RampGenerator', 'slope'),
-            time_step=self.config.getfloat('System', 'time_step')
+            slope=self.config.slope,
+            time_step=self.config.time_step,
+            waveform=load_waveform(self.config.ramp_waveform)
         )
         self.comparator = Comparator()
         self.tdc = TDC(
-            num_tdc=self.config.getint('TDC', 'num_tdc'),
-            time_precision=self.config.getfloat('TDC', 'time_precision')
+            num_tdc=self.config.num_tdc,
+            time_precision=self.config.time_precision
         )
         
+        # analytic: closed-form crossing of the linear ramp
+        # stepping: time-stepping simulation of the ramp, for non-linear ramps
+        # event: one shared ramp sweep, jumping from one crossing event to the next
+        # sweep: one shared ramp sweep over all sorted thresholds at once (default)
+        self.crossing_mode = self.config.crossing_mode
+        if self.crossing_mode == 'analytic' and self.ramp_generator.waveform is not None:
+            raise ValueError("crossing_mode 'analytic' needs the linear ramp, use 'sweep' for ramp waveforms")
+        # Ramp lookup table shared by all systems with the same ramp and TDC range
+        self.time_grid, self.ramp_values = ramp_table(self.ramp_generator, self.tdc.max_time)
+        
     def _initialize_metrics(self):
         # Create components dictionary for metrics calculators
         self.components = {
@@ -78,20 +125,59 @@ class PWMSystem:
         self.delay_metrics = DelayMetrics(self.components)
         self.power_metrics = PowerMetrics(self.components)
         self.area_metrics = AreaMetrics(self.components)
+        self.pipeline_metrics = PipelineMetrics(self.components)
+        
+        # Per-component energy breakdown and cycle timing of the last processed call
+        self.last_energy = None
+        self.last_cycles = None
         
     def set_weights(self, weights):
         """
 #        Set custom weights for the crossbar array.
         
 #        Parameters:
-#            weights: numpy array of shape (array_rows, array_columns) containing weight values
+#            weights: numpy array of shape (array_rows, array_columns) containing weight values,
+#                     or with the signed weight mapping, (array_rows, 16) signed weights
     """
-        rows = self.config.getint('Crossbar', 'array_rows')
-        cols = self.config.getint('Crossbar', 'array_columns')
+        if self.weight_mapping == 'signed':
+            weights = self.signed_layout(weights)
+        self.set_cells(weights)
+        
+    def signed_layout(self, weights):
+        """
+        Differential mapping of signed weights onto the column pairs: the magnitude
+        of a positive weight goes on column 2k and that of a negative weight on
+        column 2k + 1, so subtractor k outputs the signed dot product.
+        
+        Parameters:
+            weights: numpy array of shape (array_rows, 16) of signed weights
+        
+        Returns:
+            numpy array of shape (array_rows, array_columns) of cell values
+        """
+        weights = np.asarray(weights)
+        rows = self.config.array_rows
+        pairs = len(self.subtractors)
+        if weights.shape != (rows, pairs):
+            raise ValueError(f"Signed weights must be a {rows}x{pairs} array")
+        cells = np.zeros((rows, self.config.array_columns), dtype=weights.dtype)
+        cells[:, 0:2 * pairs:2] = np.maximum(weights, 0)
+        cells[:, 1:2 * pairs:2] = np.maximum(-weights, 0)
+        return cells
+        
+    def set_cells(self, weights):
+        """
+        Program the crossbar cells directly, one value per cell.
+        
+        Parameters:
+            weights: numpy array of shape (array_rows, array_columns)
+        """
+        rows = self.config.array_rows
+        cols = self.config.array_columns
         if weights.shape != (rows, cols):
             raise ValueError(f"Weights must be a {rows}x{cols} array")
         
-        max_weight = (1 << self.config.getint('Crossbar', 'cell_weight_bits')) - 1
+        max_weight = (1 << self.config.cell_weight_bits) - 1
         if np.any(weights > max_weight) or np.any(weights < 0):
             raise ValueError(f"Weights must be between 0 and {max_weight}")
         
@@ -136,70 +222,321 @@ class PWMSystem:
         analog_inputs = [self.dac.convert(input_val) for input_val in digital_inputs]
     
         # Get all column outputs for all selected rows at once
-        subtracted_values = []
-        for i in range(0, self.crossbar.array_columns, 2):
-            # Sum odd-numbered column (0, 2, 4, etc.)
-            odd_sum = self.crossbar.sum_odd_column(digital_inputs, selected_rows, i)
-            
-            # Sum even-numbered column (1, 3, 5, etc.)
-            even_sum = self.crossbar.sum_odd_column(digital_inputs, selected_rows, i + 1)
-            
-            # Use subtractor to get difference
-            subtractor_idx = i // 2
-            subtracted_value = self.subtractors[subtractor_idx].subtract(odd_sum, even_sum)
-            print(f"Subtractor {subtractor_idx}: {odd_sum} - {even_sum} = {subtracted_value}")
-            subtracted_values.append(subtracted_value)
+        column_outputs = self.crossbar.mvm(digital_inputs, selected_rows)
+        subtracted_values = self.subtract_columns(column_outputs)
+        if self.tracer.level >= COLUMN:
+            self.tracer.record_array(COLUMN, 'subtract', np.arange(len(subtracted_values)), subtracted_values)
     
         # Initialize ramp generator
         self.ramp_generator.enable()
         start_time = 0
-        stop_time = 0
-        current_time = 0
-        sub_offset = self.config.getfloat('Subtractor', 'sub_offset')
         #scaling factor for the output of 1*1 in crossbar
-        scaling_factor = ((self.crossbar.vin * self.dac.pulse_period) / 
-                               (self.crossbar.Ron * self.crossbar.capacitance * self.crossbar.A))  / (self.crossbar.on_off_ratio)
-        print(f"scaling_factor: {scaling_factor}")
-        #0.0006 is the output of 1*1 in crossbar
-        output_offset = sub_offset/scaling_factor
-    
-        # Process each subtracted value to get final outputs
-        for subtracted_value in subtracted_values:
-            stop_time=0
-            current_time=0
-            while True:
-                ramp_value = self.ramp_generator.get_value(current_time)
-                if self.comparator.compare(ramp_value, subtracted_value):
-                    stop_time = current_time
-                    print(f"crossing_point: {stop_time}")
-                    break
-            
-                current_time += self.config.getfloat('System', 'time_step')
-                if current_time > self.tdc.max_time:
-                    stop_time = self.tdc.max_time
-                    
-                    break
-        
-            max_operation_time = max(max_operation_time, current_time)
+        scaling_factor = self.crossbar.scaling_factor
+        if self.tracer.level >= SUMMARY:
+            self.tracer.record(SUMMARY, 'scaling_factor', value=scaling_factor)
+        output_offset = self.output_offset
+    
+        # Find where the ramp crosses each subtracted value
+        if self.crossing_mode == 'analytic':
+            stop_times, end_times = self._analytic_crossings(subtracted_values)
+        elif self.crossing_mode == 'event':
+            stop_times, end_times = self._event_crossings(subtracted_values)
+        elif self.crossing_mode == 'sweep':
+            stop_times, end_times = self._sweep_crossings(subtracted_values)
+        else:
+            stop_times, end_times = self._stepping_crossings(subtracted_values)
+    
+        # Process each crossing to get final outputs
+        for col, (stop_time, current_time) in enumerate(zip(stop_times, end_times)):
+            max_operation_time = max(max_operation_time, float(current_time))
         
             if stop_time < self.tdc.max_time:
                #adding the offset to the output - 0.006 here needs to be changed according to crossbar parameters
                 #0.0006 is the output of 1*1 in crossbar
                output = self.tdc.measure_time(start_time, stop_time) - output_offset
-               print(f"Start: {start_time}, Stop: {stop_time}, Output: {output}")
+               if self.tracer.level >= COLUMN:
+                   self.tracer.record(COLUMN, 'output', col, output, stop_time)
                outputs.append(output)
             else:
                 outputs.append(2**self.tdc.num_tdc - 1)
     
+        if self.tracer.level >= SUMMARY:
+            self.tracer.record(SUMMARY, 'operation_time', time=max_operation_time)
+        self.last_energy = self.energy_metrics.calculate_energy(digital_inputs, column_outputs, stop_times, end_times)
         metrics = self.calculate_metrics(max_operation_time)
         return outputs, metrics
         
-    def calculate_metrics(self, operation_time):
+    def process_batch(self, inputs, selected_rows):
+        """
+        Process a batch of input vectors through the PWM system in one call.
+        Every stage is evaluated on whole arrays across the batch dimension.
+        
+        Parameters:
+            inputs: numpy array of shape (batch, len(selected_rows)) of digital input values
+            selected_rows: List of rows to apply inputs to
+        
+        Returns:
+            outputs: numpy array of TDC outputs, shape (batch, 16)
+            operation_times: numpy array of per-sample operation times, shape (batch,)
+        """
+        inputs = np.atleast_2d(np.asarray(inputs))
+        if inputs.shape[1] != len(selected_rows):
+            raise ValueError("Number of inputs must match number of selected rows")
+        
+        # Convert all digital inputs to analog
+        analog_inputs = self.dac.convert(inputs)
+        
+        # Column outputs for every sample, then the analog-to-digital chain
+        column_outputs = self.crossbar.mvm(inputs, selected_rows)
+        outputs, operation_times = self.convert_columns(column_outputs, inputs)
+        self.last_cycles = {
+            'pulse_widths': np.max(analog_inputs, axis=-1),
+            'conversion_times': operation_times,
+            'energy': self.last_energy,
+            'num_rows': len(selected_rows),
+        }
+        return outputs, operation_times
+    
+    def subtract_columns(self, column_outputs):
+        """
+        All subtractors at once on the column pairs (2k, 2k + 1), viewed as a
+        (..., 16, 2) tensor.
+        
+        Returns:
+            numpy array of shape (..., 16)
+        """
+        column_outputs = np.asarray(column_outputs, dtype=float)
+        num_pairs = len(self.subtractors)
+        pairs = column_outputs[..., :2 * num_pairs].reshape(column_outputs.shape[:-1] + (num_pairs, 2))
+        return Subtractor.subtract_pairs(pairs, self.sub_offset)
+    
+    def convert_columns(self, column_outputs, inputs):
+        """
+        Subtractor, ramp/comparator and TDC stages for precomputed column outputs.
+        The energy of the conversion is left in last_energy.
+        
+        Parameters:
+            column_outputs: numpy array of shape (..., array_columns)
+            inputs: Digital inputs that produced the column outputs, shape (..., rows)
+                    (leading dimensions must broadcast against column_outputs)
+        
+        Returns:
+            outputs: numpy array of TDC outputs, shape (..., 16)
+            operation_times: numpy array of operation times, shape (...)
+        """
+        column_outputs = np.asarray(column_outputs, dtype=float)
+        subtracted_values = self.subtract_columns(column_outputs)
+        
+        self.ramp_generator.enable()
+        start_time = 0
+        output_offset = self.output_offset
+        
+        if self.crossing_mode == 'analytic':
+            stop_times, end_times = self._analytic_crossings(subtracted_values)
+        elif self.crossing_mode == 'event':
+            stop_times, end_times = self._event_crossings(subtracted_values)
+        elif self.crossing_mode == 'sweep':
+            stop_times, end_times = self._sweep_crossings(subtracted_values)
+        else:
+            crossings = [self._stepping_crossings(values) for values in subtracted_values.reshape(-1, len(self.subtractors))]
+            stop_times = np.array([stops for stops, _ in crossings]).reshape(subtracted_values.shape)
+            end_times = np.array([ends for _, ends in crossings]).reshape(subtracted_values.shape)
+        
+        outputs = np.where(stop_times < self.tdc.max_time,
+                           self.tdc.quantize(start_time, stop_times) - output_offset,
+                           2**self.tdc.num_tdc - 1)
+        operation_times = np.maximum(end_times.max(axis=-1), 0)
+        self.last_energy = self.energy_metrics.calculate_energy(inputs, column_outputs, stop_times, end_times)
+        
+        if self.tracer.level >= COLUMN:
+            self.tracer.record_array(COLUMN, 'output', np.arange(outputs.shape[-1]), outputs, stop_times)
+        if self.tracer.level >= SUMMARY:
+            self.tracer.record_array(SUMMARY, 'operation_time', -1, np.nan, operation_times)
+        return outputs, operation_times
+    
+    def _stepping_crossings(self, subtracted_values):
+        """
+        Steps the ramp by time_step until it crosses each subtracted value,
+        reading the ramp from the precomputed ramp table.
+        
+        Returns:
+            stop_times: Crossing time per column (tdc.max_time if the ramp never crosses)
+            end_times: Time at which the loop stopped for each column
+        """
+        stop_times = []
+        end_times = []
+        trace_columns = self.tracer.level >= COLUMN
+        trace_steps = self.tracer.level >= TIMESTEP
+        # The last grid point is the first step past max_time
+        time_grid = self.time_grid.tolist()
+        ramp_values = self.ramp_values[:-1].tolist()
+        for col, subtracted_value in enumerate(subtracted_values):
+            stop_time = self.tdc.max_time
+            end_time = time_grid[-1]
+            for current_time, ramp_value in zip(time_grid, ramp_values):
+                if trace_steps:
+                    self.tracer.record(TIMESTEP, 'ramp', col, ramp_value, current_time)
+                if self.comparator.compare(ramp_value, subtracted_value):
+                    stop_time = end_time = current_time
+                    if trace_columns:
+                        self.tracer.record(COLUMN, 'crossing', col, subtracted_value, stop_time)
+                    break
+            
+            stop_times.append(stop_time)
+            end_times.append(end_time)
+        return stop_times, end_times
+    
+    def _analytic_crossings(self, subtracted_values):
+        """
+        Closed-form equivalent of _stepping_crossings for the linear ramp; gives the
+        same crossing times on the time_step grid without stepping through it.
+        Accepts subtracted values of any shape, e.g. (16,) or (batch, 16).
+        """
+        subtracted_values = np.asarray(subtracted_values, dtype=float)
+        index = self.ramp_generator.crossing_index(subtracted_values, self.time_grid)
+        crossed = index < len(self.time_grid) - 1
+        end_times = self.time_grid[index]
+        stop_times = np.where(crossed, end_times, self.tdc.max_time)
+        if self.tracer.level >= COLUMN:
+            columns = np.broadcast_to(np.arange(index.shape[-1]), index.shape)
+            self.tracer.record_array(COLUMN, 'crossing', columns[crossed], subtracted_values[crossed], end_times[crossed])
+        
+        # Leave the ramp and comparator in the state the last loop iteration would
+        last_index = index.flat[-1] if crossed.flat[-1] else index.flat[-1] - 1
+        ramp_value = self.ramp_generator.get_value(float(self.time_grid[last_index]))
+        self.comparator.compare(ramp_value, float(subtracted_values.flat[-1]))
+        return stop_times, end_times
+    
+    def _event_crossings(self, subtracted_values):
+        """
+        Event-driven conversion: all comparators watch a single sweep of the
+        shared ramp, as in hardware. Pending crossings are kept in a priority
+        queue ordered by time, and simulated time jumps from one crossing event
+        to the next; every comparator that trips at an event is resolved there.
+        Gives the same crossing times as the other modes, for any rising ramp.
+        Accepts subtracted values of any shape, one sweep per (..., 16) row.
+        """
+        subtracted_values = np.asarray(subtracted_values, dtype=float)
+        sweeps = subtracted_values.reshape(-1, subtracted_values.shape[-1])
+        overflow_index = len(self.time_grid) - 1
+        overflow_time = float(self.time_grid[overflow_index])
+        stop_times = np.full(sweeps.shape, self.tdc.max_time)
+        end_times = np.full(sweeps.shape, overflow_time)
+        trace_columns = self.tracer.level >= COLUMN
+        trace_steps = self.tracer.level >= TIMESTEP
+        
+        # Scheduled event of every column: the grid point at which the ramp reaches it
+        event_indices = np.searchsorted(self.ramp_values, sweeps, side='left').tolist()
+        time_grid = self.time_grid.tolist()
+        ramp_values = self.ramp_values.tolist()
+        for sweep, (values, indices) in enumerate(zip(sweeps.tolist(), event_indices)):
+            pending = [(index, col) for col, index in enumerate(indices)]
+            heapq.heapify(pending)
+            while pending and pending[0][0] < overflow_index:
+                # Jump to the next event and resolve every comparator that trips there
+                index = pending[0][0]
+                current_time = time_grid[index]
+                ramp_value = ramp_values[index]
+                if trace_steps:
+                    self.tracer.record(TIMESTEP, 'ramp', -1, ramp_value, current_time)
+                while pending and pending[0][0] == index:
+                    _, col = heapq.heappop(pending)
+                    if not self.comparator.compare(ramp_value, values[col]):
+                        # Not tripped yet, check again on the next grid point
+                        heapq.heappush(pending, (index + 1, col))
+                        continue
+                    stop_times[sweep, col] = end_times[sweep, col] = current_time
+                    if trace_columns:
+                        self.tracer.record(COLUMN, 'crossing', col, values[col], current_time)
+            # Columns still pending when the ramp passes max_time never cross
+        return stop_times.reshape(subtracted_values.shape), end_times.reshape(subtracted_values.shape)
+    
+    def _sweep_crossings(self, subtracted_values):
+        """
+        Shared-ramp conversion as a sorted-threshold sweep: the subtracted values
+        of all columns (and samples) are sorted and met by one monotone sweep of
+        the ramp over the time grid, np.searchsorted assigning every crossing in
+        O(n log n). Works for any ramp that rises monotonically over the grid.
+        The latest crossing of each row bounds its shared conversion window.
+        Accepts subtracted values of any shape, e.g. (16,) or (batch, 16).
+        """
+        subtracted_values = np.asarray(subtracted_values, dtype=float)
+        order = np.argsort(subtracted_values, axis=None)
+        index = np.empty(subtracted_values.size, dtype=int)
+        # First grid point at which the ramp reaches each threshold
+        index[order] = np.searchsorted(self.ramp_values, subtracted_values.ravel()[order], side='left')
+        index = np.minimum(index, len(self.time_grid) - 1).reshape(subtracted_values.shape)
+        crossed = index < len(self.time_grid) - 1
+        end_times = self.time_grid[index]
+        stop_times = np.where(crossed, end_times, self.tdc.max_time)
+        if self.tracer.level >= COLUMN:
+            columns = np.broadcast_to(np.arange(index.shape[-1]), index.shape)
+            self.tracer.record_array(COLUMN, 'crossing', columns[crossed], subtracted_values[crossed], end_times[crossed])
+        return stop_times, end_times
+        
+    def outputs_per_mvm(self):
+        return len(self.subtractors)
+
+    def _schedule(self):
+        # Pipeline schedule of the last process_batch call, computed once
+        if self.last_cycles is None:
+            raise ValueError("Run process_batch before calculating the pipeline")
+        if 'schedule' not in self.last_cycles:
+            stage_times = self.pipeline_metrics.stage_times(self.last_cycles['pulse_widths'],
+                                                            self.last_cycles['conversion_times'])
+            self.last_cycles['schedule'] = (stage_times,) + self.pipeline_metrics.schedule(stage_times)
+        return self.last_cycles['schedule']
+
+    def calculate_pipeline(self):
+        """
+        Pipelined throughput and latency for the stream of cycles of the last
+        process_batch call, in batch order. See PipelineMetrics.calculate_pipeline.
+        """
+        stage_times, _, departure = self._schedule()
+        return self.pipeline_metrics.calculate_pipeline(
+            stage_times, departure,
+            cycles_per_mvm=self.cycles_per_mvm,
+            macs_per_mvm=self.last_cycles['num_rows'] * self.outputs_per_mvm()
+        )
+
+    def calculate_power(self, bin_width=None):
+        """
+        Average and peak power of the last process_batch call, from its
+        activity energy on the pipeline schedule. See PowerMetrics.calculate_power.
+        """
+        stage_times, start_times, _ = self._schedule()
+        return self.power_metrics.calculate_power(self.last_cycles['energy'], stage_times,
+                                                  start_times, bin_width)
+
+    def batch_metrics(self, outputs, operation_times):
+        """
+        calculate_metrics for every sample of the last process_batch call, as
+        columns for MetricsStore.extend instead of one dict per sample.
+        
+        Returns:
+            Dictionary of per-sample arrays (scalars for delay and area) plus the output codes
+        """
+        operation_times = np.asarray(operation_times, dtype=float)
+        energy = np.asarray(self.last_energy['total'], dtype=float)
+        return {
+            'energy': energy,
+            'delay': self.delay_metrics.calculate_delay(),
+            'power': np.divide(energy, operation_times, out=np.zeros_like(energy), where=operation_times > 0),
+            'area': self.area_metrics.calculate_area(),
+            'operation_time': operation_times,
+            'codes': outputs,
+        }
+
+    def calculate_metrics(self, operation_time, energy=None):
         """Calculate energy and delay metrics for the system using separate modules"""
+        # Energy defaults to the total activity energy of the last processed call
+        if energy is None:
+            energy = float(np.sum(self.last_energy['total'])) if self.last_energy else 0.0
         return {
-            'energy': self.energy_metrics.calculate_energy(operation_time),
+            'energy': energy,
             'delay': self.delay_metrics.calculate_delay(),
-            'power': self.power_metrics.calculate_power(),
+            # Average power over the operation
+            'power': energy / operation_time if operation_time > 0 else 0.0,
             'area': self.area_metrics.calculate_area(),
             'operation_time': operation_time
         }
\ No newline at end of file
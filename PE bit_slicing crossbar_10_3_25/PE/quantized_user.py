@@ -11,16 +11,6 @@ def print_weight_matrix(weight_matrix, weights_per_row):
             print(f"Weight[{col_idx}]: 0x{weight:04X}", end="  ")
         print()
 
-def split_input_to_chunks(input_value, total_bits, chunk_size):
-    """Split input into chunks from LSB to MSB"""
-    chunks = []
-    for i in range(0, total_bits, chunk_size):
-        # Extract chunk_size bits starting from LSB
-        mask = (1 << chunk_size) - 1
-        chunk = (input_value >> i) & mask
-        chunks.append(chunk)
-    return chunks
-
 if __name__ == "__main__":
     config_path = Path("config.ini")
     print(f"Absolute config path: {config_path.absolute()}")
@@ -29,12 +19,12 @@ if __name__ == "__main__":
     system = QuantizedPWMSystem(config_path)
     
     # Get configuration limits from correct sections
-    num_rows = system.config.getint('Crossbar', 'array_rows')
-    num_columns = system.config.getint('Crossbar', 'array_columns')
-    weight_bits = system.config.getint('Quantization', 'weight_bits')
-    cell_bits = system.config.getint('Crossbar', 'cell_weight_bits')
-    input_bits = system.config.getint('Quantization', 'input_bits')
-    dac_bits = system.config.getint('DAC', 'num_bits')
+    num_rows = system.config.array_rows
+    num_columns = system.config.array_columns
+    weight_bits = system.config.weight_bits
+    cell_bits = system.config.cell_weight_bits
+    input_bits = system.config.input_bits
+    dac_bits = system.config.num_bits
     
     # Calculate maximum values
     max_weight = (1 << weight_bits) - 1
@@ -91,30 +81,10 @@ if __name__ == "__main__":
         if input_value > max_input:
             raise ValueError(f"Input for row {row} (0x{input_value:X}) exceeds maximum (0x{max_input:X})")
     
-    # Process inputs cycle by cycle
-    num_cycles = math.ceil(input_bits / dac_bits)
-    all_cycle_outputs = []
-    
-    print("\nProcessing inputs cycle by cycle:")
-    for cycle in range(num_cycles):
-        print(f"\nCycle {cycle + 1}:")
-        cycle_inputs = []
-        cycle_rows = []
-        
-        # Prepare inputs for this cycle
-        for row in active_rows:
-            if row in row_inputs:
-                input_chunks = split_input_to_chunks(row_inputs[row], input_bits, dac_bits)
-                if cycle < len(input_chunks):
-                    chunk = input_chunks[cycle]
-                    print(f"Row {row}: Processing chunk 0x{chunk:X}")
-                    cycle_inputs.append(chunk)
-                    cycle_rows.append(row)
-        
-        if cycle_inputs:  # Only process if we have inputs for this cycle
-            outputs, metrics = system.process_inputs(cycle_inputs, cycle_rows)
-            all_cycle_outputs.append((outputs, metrics))
-            print(f"Cycle {cycle + 1} outputs: {outputs}")
+    # Process inputs, one cycle per input chunk, shift-added back to full precision
+    digital_inputs = [row_inputs[row] for row in active_rows]
+    outputs, metrics = system.process_inputs(digital_inputs, active_rows)
+    reference = system.reference_dot_product(digital_inputs, active_rows)[0]
     
     # Print final results
     print("\nFinal Results:")
@@ -128,8 +98,7 @@ if __name__ == "__main__":
     for row, input_val in row_inputs.items():
         print(f"Row {row}: 0x{input_val:04X}")
     
-    print("\nCycle-by-cycle outputs:")
-    for cycle, (outputs, metrics) in enumerate(all_cycle_outputs):
-        print(f"Cycle {cycle + 1}:")
-        print(f"  Outputs: {outputs}")
-        print(f"  Metrics: {metrics}")
\ No newline at end of file
+    print("\nDot products (PE vs integer reference):")
+    for position, (output, expected) in enumerate(zip(outputs, reference)):
+        print(f"Weight[{position}]: {output}  reference: {expected}  error: {output - expected}")
+    print(f"Metrics: {metrics}")
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from pathlib import Path
+import numpy as np
+
+
+class RampTableCache:
+    """
+    LRU cache of materialized ramp waveforms shared by all PWMSystem instances.
+
+    A table is the time grid the conversion loop visits together with the ramp
+    value at every grid point. It only depends on the ramp shape, time_step and
+    the TDC range, so systems with the same ramp reuse one read-only copy. The
+    least recently used tables are evicted once the cached arrays exceed
+    max_bytes.
+    """
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._tables = OrderedDict()
+
+    def __len__(self):
+        return len(self._tables)
+
+    def get(self, key, build):
+        """
+        Cached table for key, built with build() on a miss.
+
+        Returns:
+            Tuple of read-only numpy arrays
+        """
+        table = self._tables.get(key)
+        if table is not None:
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return table
+
+        self.misses += 1
+        table = tuple(np.asarray(array) for array in build())
+        for array in table:
+            array.flags.writeable = False
+        self._tables[key] = table
+        self.nbytes += sum(array.nbytes for array in table)
+        # Keep at least the new table, even if it alone exceeds max_bytes
+        while self.nbytes > self.max_bytes and len(self._tables) > 1:
+            _, evicted = self._tables.popitem(last=False)
+            self.nbytes -= sum(array.nbytes for array in evicted)
+        return table
+
+    def clear(self):
+        self._tables.clear()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {'tables': len(self._tables), 'nbytes': self.nbytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+RAMP_TABLES = RampTableCache()
+
+
+def ramp_table(ramp_generator, max_time, extra_steps=0, cache=RAMP_TABLES):
+    """
+    Time grid and ramp values up to the first step past max_time, from the cache.
+
+    Parameters:
+        ramp_generator: RampGenerator defining the ramp shape and time_step
+        max_time: Largest time the TDC measures
+        extra_steps: Grid points to add past max_time
+
+    Returns:
+        time_grid, ramp_values: Read-only numpy arrays of equal length
+    """
+    key = (ramp_generator.waveform, ramp_generator.slope, ramp_generator.time_step, max_time, extra_steps)
+
+    def build():
+        time_grid = ramp_generator.time_grid(max_time, extra_steps)
+        return time_grid, ramp_generator.values(time_grid)
+
+    return cache.get(key, build)
+
+
+def load_waveform(spec):
+    """
+    Parses a ramp waveform specification. An empty spec is the linear ramp.
+    Otherwise it is a CSV file of (time, voltage) rows, e.g. a measured ramp, or
+    inline piecewise-linear points such as '0:0, 200e-9:0.4, 4e-6:0.6'.
+
+    Returns:
+        None for the linear ramp, else a (times, values) tuple of float tuples
+    """
+    spec = spec.strip()
+    if not spec:
+        return None
+    if Path(spec).suffix == '.csv':
+        points = np.loadtxt(spec, delimiter=',', ndmin=2)
+    else:
+        try:
+            points = np.array([[float(value) for value in point.split(':')] for point in spec.split(',')])
+        except ValueError:
+            raise ValueError(f"Ramp waveform must be a .csv file or 'time:voltage, ...' points, got '{spec}'")
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("Ramp waveform points must be (time, voltage) pairs")
+    return tuple(map(float, points[:, 0])), tuple(map(float, points[:, 1]))
@@ -0,0 +1,227 @@
+import configparser
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from pwm_system import PWMSystem
+from pe_config import PEConfig
+
+# Bump when the simulator changes in a way that invalidates cached results
+CACHE_VERSION = 5
+
+# Options that must stay integers when sampled from a continuous range
+INTEGER_OPTIONS = {
+    'DAC.num_bits', 'TDC.num_tdc', 'Crossbar.array_rows', 'Crossbar.array_columns',
+    'Crossbar.cell_weight_bits', 'Quantization.weight_bits', 'Quantization.input_bits',
+    'Quantization.chunk_size',
+}
+
+# Workload every point is evaluated on
+DEFAULT_WORKLOAD = {'num_samples': 256, 'num_rows': 8, 'seed': 0}
+
+
+def grid(space):
+    """
+    Full factorial grid over a parameter space.
+
+    Parameters:
+        space: {'Section.option': [values...]}
+
+    Returns:
+        List of {'Section.option': value} points
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_samples(space, num_points, seed=0):
+    """
+    Uniform random points. Each entry of space is either a list of values to
+    choose from or a (low, high) tuple to sample from.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            columns[name] = rng.uniform(values[0], values[1], num_points)
+        else:
+            columns[name] = [values[i] for i in rng.integers(0, len(values), num_points)]
+    return _points(columns, num_points)
+
+
+def latin_hypercube(space, num_points, seed=0):
+    """
+    Latin-hypercube points: every (low, high) range is split into num_points
+    strata and each stratum is used exactly once. List entries are cycled
+    through in shuffled order.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, values in space.items():
+        strata = rng.permutation(num_points)
+        if isinstance(values, tuple):
+            unit = (strata + rng.uniform(0, 1, num_points)) / num_points
+            columns[name] = values[0] + unit * (values[1] - values[0])
+        else:
+            columns[name] = [values[i % len(values)] for i in strata]
+    return _points(columns, num_points)
+
+
+def _points(columns, num_points):
+    points = []
+    for i in range(num_points):
+        point = {}
+        for name, values in columns.items():
+            value = values[i]
+            point[name] = int(round(value)) if name in INTEGER_OPTIONS else _plain(value)
+        points.append(point)
+    return points
+
+
+def _plain(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def load_config_dict(config_path):
+    """
+    Read an INI file into a {section: {option: value}} dict of strings.
+    """
+    config = configparser.ConfigParser()
+    if not config.read(config_path):
+        raise FileNotFoundError(f"Config file not found at {config_path}")
+    return {section: dict(config[section]) for section in config.sections()}
+
+
+def apply_point(base_config, point):
+    """
+    Copy of base_config with the point's 'Section.option' overrides applied.
+    """
+    config = {section: dict(options) for section, options in base_config.items()}
+    for name, value in point.items():
+        section, option = name.split('.', 1)
+        config.setdefault(section, {})[option.lower()] = str(value)
+    return config
+
+
+def config_key(config, workload):
+    """
+    Content hash of a configuration and workload, used as the cache key. The
+    config is hashed in its parsed form, so e.g. Ron = 5000 and 5000.0 share a key.
+    """
+    config = PEConfig.load(config).to_dict()
+    canonical = json.dumps({'version': CACHE_VERSION, 'config': config, 'workload': workload},
+                           sort_keys=True)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def evaluate(config, workload):
+    """
+    Build a PWMSystem from an in-memory config and evaluate it on a random workload.
+
+    Returns:
+        Dictionary of accuracy, energy, delay, power and area metrics
+    """
+    system = PWMSystem(config)
+    rng = np.random.default_rng(workload['seed'])
+    num_rows = min(workload['num_rows'], system.crossbar.array_rows)
+    max_weight = (1 << system.config.cell_weight_bits) - 1
+    max_input = (1 << system.num_bits) - 1
+
+    num_pairs = len(system.subtractors)
+    if system.weight_mapping == 'signed':
+        # Signed weights, one per column pair, mapped differentially by set_weights
+        weights = rng.integers(-max_weight, max_weight + 1, (system.crossbar.array_rows, num_pairs))
+    else:
+        # Unsigned weights on the even-numbered column of each pair, as QuantizedPWMSystem maps them
+        weights = np.zeros((system.crossbar.array_rows, system.crossbar.array_columns), dtype=np.int64)
+        weights[:, 0::2] = rng.integers(0, max_weight + 1, (system.crossbar.array_rows, num_pairs))
+    inputs = rng.integers(0, max_input + 1, (workload['num_samples'], num_rows))
+    selected_rows = list(range(num_rows))
+    system.set_weights(weights.astype(float))
+
+    outputs, operation_times = system.process_batch(inputs, selected_rows)
+
+    # One output LSB is one unit of the differential dot product of a column pair
+    products = inputs @ weights[selected_rows]
+    reference = products if system.weight_mapping == 'signed' else products[:, 0::2] - products[:, 1::2]
+    error = np.abs(outputs - reference)
+
+    # Energy per inference, averaged over the workload
+    metrics = system.calculate_metrics(float(operation_times.mean()), float(system.last_energy['total'].mean()))
+    return {
+        'mean_abs_error': float(error.mean()),
+        'max_abs_error': float(error.max()),
+        'exact_fraction': float(np.mean(error < 0.5)),
+        'energy': float(metrics['energy']),
+        'delay': float(metrics['delay']),
+        'power': float(metrics['power']),
+        'area': float(metrics['area']),
+        'operation_time': float(metrics['operation_time']),
+    }
+
+
+def _evaluate_task(args):
+    return evaluate(*args)
+
+
+class Sweep:
+    """
+    Design-space sweep over config.ini parameters.
+
+    Points are evaluated on a process pool and every result is stored under
+    cache_dir by the hash of its full configuration and workload, so reruns
+    only compute points that have not been seen before.
+    """
+    def __init__(self, config_path, cache_dir='.sweep_cache', workload=None, max_workers=None):
+        self.base_config = load_config_dict(config_path)
+        self.cache_dir = Path(cache_dir)
+        self.workload = dict(DEFAULT_WORKLOAD, **(workload or {}))
+        self.max_workers = max_workers or os.cpu_count()
+
+    def _cache_path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load(self, key):
+        path = self._cache_path(key)
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+        return None
+
+    def _store(self, key, result):
+        path = self._cache_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so an interrupted sweep never leaves a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+    def run(self, points):
+        """
+        Evaluate a list of {'Section.option': value} points.
+
+        Returns:
+            List of result dictionaries in the order of points, each holding the
+            point's parameters, its metrics and its cache key
+        """
+        configs = [apply_point(self.base_config, point) for point in points]
+        keys = [config_key(config, self.workload) for config in configs]
+        results = {key: self._load(key) for key in set(keys)}
+
+        missing = [key for key in dict.fromkeys(keys) if results[key] is None]
+        if missing:
+            tasks = [(configs[keys.index(key)], self.workload) for key in missing]
+            if self.max_workers > 1 and len(missing) > 1:
+                with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+                    computed = list(pool.map(_evaluate_task, tasks))
+            else:
+                computed = [_evaluate_task(task) for task in tasks]
+            for key, result in zip(missing, computed):
+                self._store(key, result)
+                results[key] = result
+
+        return [dict(point, **results[key], key=key) for point, key in zip(points, keys)]
@@ -0,0 +1,227 @@
+import math
+import numpy as np
+from PE_quantization import QuantizedPWMSystem
+from power_metrics import COMPONENT_STAGES
+
+
+class TiledMVM:
+    """
+    Maps an M x N matrix of full-precision weights onto as many PEs as needed.
+
+    Every PE holds an (array_rows x weights_per_row) tile of the matrix, bit-sliced
+    into cell_weight_bits cells on the odd-numbered column of each column pair
+    (on either column by sign with the signed weight mapping).
+    All PEs share one configuration, so a single QuantizedPWMSystem runs the
+    analog chain for every tile at once; partial sums of the tiles along M are
+    then reduced digitally.
+    """
+    def __init__(self, config_path, weights, blocks_per_step=64):
+        self.config_path = config_path
+        self.pe = QuantizedPWMSystem(config_path)
+        self.blocks_per_step = blocks_per_step
+        self.set_weights(weights)
+
+    @classmethod
+    def from_cells(cls, config_path, cells, num_inputs, num_outputs, blocks_per_step=64):
+        """
+        Rebuild a tiled matrix from an existing cell array (e.g. in shared memory)
+        without re-slicing the weights. reference() is not available on it.
+        """
+        tiled = cls.__new__(cls)
+        tiled.config_path = config_path
+        tiled.pe = QuantizedPWMSystem(config_path)
+        tiled.blocks_per_step = blocks_per_step
+        tiled.weights = None
+        tiled._set_cells(cells, num_inputs, num_outputs)
+        return tiled
+
+    def set_weights(self, weights):
+        """
+        Partition the weight matrix into PE tiles.
+
+        Parameters:
+            weights: numpy array of shape (M, N), M inputs by N outputs
+        """
+        weights = np.asarray(weights, dtype=np.int64)
+        if weights.ndim != 2:
+            raise ValueError("Weights must be a 2-D (inputs x outputs) array")
+        max_weight = (1 << self.pe.weight_bits) - 1
+        min_weight = -max_weight if self.pe.weight_mapping == 'signed' else 0
+        if np.any(weights > max_weight) or np.any(weights < min_weight):
+            raise ValueError(f"Weights must be between {min_weight} and {max_weight}")
+
+        self.weights = weights
+        num_inputs, num_outputs = weights.shape
+        tile_rows = self.pe.crossbar.array_rows
+        row_tiles = math.ceil(num_inputs / tile_rows)
+        column_tiles = math.ceil(num_outputs / self.pe.weights_per_row)
+
+        # Zero-pad to whole tiles and lay out the cells of all tiles side by side
+        padded = np.zeros((row_tiles * tile_rows, column_tiles * self.pe.weights_per_row), dtype=np.int64)
+        padded[:num_inputs, :num_outputs] = weights
+        layout = self.pe.cell_layout(padded, dtype=np.min_scalar_type(max_weight))
+        layout_columns = self.pe.weights_per_row * self.pe.cells_per_weight * 2
+        cells = np.zeros((row_tiles, tile_rows, column_tiles, self.pe.crossbar.array_columns),
+                         dtype=layout.dtype)
+        cells[..., :layout_columns] = layout.reshape(row_tiles, tile_rows, column_tiles, layout_columns)
+        self._set_cells(cells, num_inputs, num_outputs)
+
+    def _set_cells(self, cells, num_inputs, num_outputs):
+        # cells has shape (row_tiles, array_rows, column_tiles, array_columns)
+        self.cells = cells
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        self.row_tiles, self.tile_rows, self.column_tiles, self.tile_columns = cells.shape
+        # Effective conductances and the non-ideality engine they were computed with
+        self._conductances = None
+        self._conductance_engine = None
+
+    @property
+    def conductances(self):
+        """
+        Effective cell values under the non-ideality engine of the PE crossbar, or
+        None for ideal cells. Every tile is a separate array with its own device
+        samples. Recomputed when a different engine is attached.
+        """
+        nonideality = self.pe.crossbar.nonideality
+        if nonideality is None:
+            return None
+        if nonideality is not self._conductance_engine:
+            self._conductances = nonideality.apply(self.cells.transpose(0, 2, 1, 3)).transpose(0, 2, 1, 3)
+            self._conductance_engine = nonideality
+        return self._conductances
+
+    @property
+    def num_pes(self):
+        return self.row_tiles * self.column_tiles
+
+    def tile(self, row_tile, column_tile):
+        """
+        Crossbar weights of one PE, shape (array_rows, array_columns).
+        """
+        return self.cells[row_tile, :, column_tile, :].astype(float)
+
+    def effective_cells(self, start, stop):
+        # Cells of column tiles start..stop as the einsum sees them
+        conductances = self.conductances
+        cells = self.cells if conductances is None else conductances
+        return cells[:, :, start:stop, :].astype(float)
+
+    def run(self, inputs):
+        """
+        Multiply a batch of input vectors with the weight matrix on the PE array.
+
+        Parameters:
+            inputs: numpy array of shape (batch, M) of input values
+
+        Returns:
+            outputs: numpy array of dot products, shape (batch, N)
+            report: Dictionary with PE count, energy and latency of the batch
+        """
+        return self.merge([self.run_tiles(inputs, 0, self.column_tiles)])
+
+    def run_tiles(self, inputs, start, stop):
+        """
+        Run the PEs of column tiles start..stop on a batch of input vectors.
+
+        Returns:
+            Dictionary of partial results: outputs (batch, (stop - start) * weights_per_row),
+            tile_time (batch,) of the slowest tile, cycle_time (batch, chunks) of the
+            slowest tile in each input-chunk cycle, energy, pe_energy (batch, chunks,
+            row_tiles, stop - start, components) and saturated code count
+        """
+        inputs = np.atleast_2d(np.asarray(inputs, dtype=np.int64))
+        if inputs.shape[1] != self.num_inputs:
+            raise ValueError(f"Inputs must have {self.num_inputs} values per sample")
+        num_samples = inputs.shape[0]
+
+        # Input chunks per row tile, shape (batch, chunks, row_tiles, array_rows)
+        padded = np.zeros((num_samples, self.row_tiles * self.tile_rows), dtype=np.int64)
+        padded[:, :self.num_inputs] = inputs
+        chunks = self.pe.slice_bits(padded, self.pe.input_bits, self.pe.chunk_size)
+        chunks = chunks.transpose(1, 0, 2).reshape(num_samples, len(chunks), self.row_tiles, self.tile_rows)
+        chunks = chunks.astype(float)
+
+        outputs = np.zeros((num_samples, stop - start, self.pe.weights_per_row), dtype=np.int64)
+        tile_time = np.zeros(num_samples)
+        cycle_time = np.zeros(chunks.shape[:2])
+        energy = 0.0
+        pe_energy = []
+        saturated = 0
+        max_code = 2**self.pe.tdc.num_tdc - 1
+        for block in range(start, stop, self.blocks_per_step):
+            block_stop = min(block + self.blocks_per_step, stop)
+            cells = self.effective_cells(block, block_stop)
+
+            # Column outputs of every tile, shape (batch, chunks, row_tiles, column_tiles, array_columns)
+            column_outputs = self.pe.crossbar.scaling_factor * np.einsum('bsrk,rkct->bsrct', chunks, cells)
+            # Each PE has its own DACs, so the input chunks of a row tile drive every column tile
+            codes, cycle_times = self.pe.convert_columns(column_outputs, chunks[:, :, :, None, :])
+            saturated += int(np.count_nonzero(codes == max_code))
+
+            # Shift-add within each tile, then reduce partial sums over the row tiles
+            partial = self.pe.recombine(codes.transpose(0, 2, 3, 1, 4))
+            outputs[:, block - start:block_stop - start] = partial.sum(axis=1)
+
+            # Input chunks are sequential cycles on each PE, PEs run in parallel
+            tile_time = np.maximum(tile_time, cycle_times.sum(axis=1).max(axis=(1, 2)))
+            cycle_time = np.maximum(cycle_time, cycle_times.max(axis=(2, 3)))
+            energy += float(np.sum(self.pe.last_energy['total']))
+            pe_energy.append(np.stack([self.pe.last_energy[component] for component in COMPONENT_STAGES], axis=-1))
+
+        return {
+            'outputs': outputs.reshape(num_samples, (stop - start) * self.pe.weights_per_row),
+            'tile_time': tile_time,
+            'cycle_time': cycle_time,
+            # All PEs share the cycle, so its pulses last as long as the largest input chunk
+            'pulse_widths': self.pe.dac.convert(chunks.max(axis=(2, 3))),
+            'energy': energy,
+            'pe_energy': np.concatenate(pe_energy, axis=3),
+            'saturated_codes': saturated,
+        }
+
+    def merge(self, partials):
+        """
+        Combine run_tiles results of consecutive column tile ranges, in order.
+
+        Returns:
+            outputs: numpy array of dot products, shape (batch, N)
+            report: Dictionary with PE count, energy and latency of the batch
+        """
+        outputs = np.concatenate([partial['outputs'] for partial in partials], axis=1)
+        tile_time = np.max([partial['tile_time'] for partial in partials], axis=0)
+        cycle_time = np.max([partial['cycle_time'] for partial in partials], axis=0)
+        # Each sample waits for the slowest tile
+        latency = tile_time + self.pe.delay_metrics.calculate_delay()
+
+        # PEs run the input-chunk cycles of successive samples in lockstep
+        stage_times = self.pe.pipeline_metrics.stage_times(partials[0]['pulse_widths'], cycle_time)
+        start_times, departure = self.pe.pipeline_metrics.schedule(stage_times)
+        pe_energy = np.concatenate([partial['pe_energy'] for partial in partials], axis=3)
+        pe_energy = pe_energy.reshape(cycle_time.size, self.num_pes, len(COMPONENT_STAGES))
+        report = {
+            'num_pes': self.num_pes,
+            'row_tiles': self.row_tiles,
+            'column_tiles': self.column_tiles,
+            'energy': sum(partial['energy'] for partial in partials),
+            'latency': float(latency.sum()),
+            'sample_latency': latency,
+            'saturated_codes': sum(partial['saturated_codes'] for partial in partials),
+            'area': self.pe.area_metrics.calculate_area(self.num_pes),
+            'pipeline': self.pe.pipeline_metrics.calculate_pipeline(
+                stage_times, departure,
+                cycles_per_mvm=cycle_time.shape[1],
+                macs_per_mvm=self.num_inputs * self.num_outputs
+            ),
+            'power': self.pe.power_metrics.calculate_power(
+                {component: pe_energy[..., i] for i, component in enumerate(COMPONENT_STAGES)},
+                stage_times, start_times
+            ),
+        }
+        return outputs[:, :self.num_outputs], report
+
+    def reference(self, inputs):
+        """
+        Integer GEMM reference for run, shape (batch, N).
+        """
+        return np.atleast_2d(np.asarray(inputs, dtype=np.int64)) @ self.weights
@@ -0,0 +1,133 @@
+import atexit
+import json
+import numpy as np
+
+# Trace levels, each level includes the events of the levels below it
+OFF = 0
+SUMMARY = 1     # one event per call (scaling factor, operation time)
+COLUMN = 2      # one event per column (column sums, subtractions, crossings, outputs)
+TIMESTEP = 3    # one event per ramp time step (stepping mode; per crossing event in event mode)
+
+LEVELS = {'off': OFF, 'summary': SUMMARY, 'column': COLUMN, 'timestep': TIMESTEP}
+
+# index is the column (or -1 for whole-call events), time is in seconds
+EVENT_DTYPE = np.dtype([
+    ('level', 'i1'),
+    ('event', 'U16'),
+    ('index', 'i8'),
+    ('value', 'f8'),
+    ('time', 'f8'),
+])
+
+
+# Tracers with a sink and events not yet written to it
+_unflushed = set()
+
+
+@atexit.register
+def _flush_all():
+    for tracer in list(_unflushed):
+        tracer.flush()
+
+
+class Tracer:
+    """
+    Buffers simulation trace events in place of print() on the hot path.
+
+    Call sites check `tracer.level >= <LEVEL>` before recording, so with the
+    level at OFF nothing is formatted or stored. With a sink, events are written
+    once buffer_size of them are buffered, on flush() or close() (also as a
+    context manager), and at interpreter exit for whatever is left.
+    """
+    def __init__(self, level='off', sink=None, buffer_size=100000):
+        self.level = LEVELS[level] if isinstance(level, str) else int(level)
+        self.sink = sink  # JSONL file path, None keeps events in memory
+        self.buffer_size = buffer_size
+        self._events = []
+        self._chunks = []
+        self._buffered = 0
+
+    def record(self, level, event, index=-1, value=np.nan, time=np.nan):
+        """
+        Records a single event.
+        """
+        self._events.append((level, event, index, value, time))
+        self._buffered += 1
+        self._buffer_full()
+
+    def record_array(self, level, event, index, value, time=np.nan):
+        """
+        Records one event per element of the broadcast index/value/time arrays.
+        """
+        index, value, time = np.broadcast_arrays(index, value, time)
+        chunk = np.empty(index.size, dtype=EVENT_DTYPE)
+        chunk['level'] = level
+        chunk['event'] = event
+        chunk['index'] = index.ravel()
+        chunk['value'] = value.ravel()
+        chunk['time'] = time.ravel()
+        if self._events:
+            self._chunks.append(self._pending())
+        self._chunks.append(chunk)
+        self._buffered += chunk.size
+        self._buffer_full()
+
+    def _buffer_full(self):
+        if not self.sink:
+            return
+        if self._buffered >= self.buffer_size:
+            self.flush()
+        else:
+            _unflushed.add(self)
+
+    def _pending(self):
+        events = np.array(self._events, dtype=EVENT_DTYPE)
+        self._events = []
+        return events
+
+    def records(self):
+        """
+        Returns the buffered events as a NumPy record array.
+        """
+        self._chunks.append(self._pending())
+        records = np.concatenate(self._chunks).view(np.recarray)
+        self._chunks = [records.view(np.ndarray)]
+        return records
+
+    def flush(self):
+        """
+        Appends the buffered events to the JSONL sink and clears the buffer.
+        """
+        records = self.records()
+        self.clear()
+        if not self.sink:
+            return records
+        with open(self.sink, 'a') as sink:
+            for record in records:
+                sink.write(json.dumps({
+                    'level': int(record['level']),
+                    'event': str(record['event']),
+                    'index': int(record['index']),
+                    'value': None if np.isnan(record['value']) else float(record['value']),
+                    'time': None if np.isnan(record['time']) else float(record['time']),
+                }) + '\n')
+        return records
+
+    def close(self):
+        """
+        Writes any buffered events to the sink.
+        """
+        if self.sink and self._buffered:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def clear(self):
+        self._events = []
+        self._chunks = []
+        self._buffered = 0
+        _unflushed.discard(self)
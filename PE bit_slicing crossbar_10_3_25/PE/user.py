@@ -10,9 +10,9 @@ if __name__ == "__main__":
     #system = QuantizedPWMSystem(config_path) 
     
     # Get configuration limits
-    num_rows = system.config.getint('Crossbar', 'array_rows')
-    num_columns = system.config.getint('Crossbar', 'array_columns')
-    weight_bits = system.config.getint('Crossbar', 'cell_weight_bits')
+    num_rows = system.config.array_rows
+    num_columns = system.config.array_columns
+    weight_bits = system.config.cell_weight_bits
     max_weight = (1 << weight_bits) - 1
     max_input_value = (1 << system.num_bits) - 1
 
@@ -1,8 +1,9 @@
 import numpy as np
+from tracing import Tracer, COLUMN
 
 class Crossbar:
     def __init__(self, Ron, Roff, on_off_ratio, capacitance, Vdd, pulse_period, array_rows, 
-                 vin, array_columns, A, weight_bits):
+                 vin, array_columns, A, weight_bits, tracer=None):
         self.Ron = Ron  # 5K ohm
         self.Roff = Roff  # 50K ohm
         self.on_off_ratio = on_off_ratio
@@ -14,11 +15,40 @@ class Crossbar:
         self.weight_bits = weight_bits
         self.A = A
         self.vin = vin
+        self.tracer = tracer if tracer is not None else Tracer()
+        
+        # Output of a single 1*1 cell; constant for the array so it is computed once
+        self.scaling_factor = ((vin * pulse_period) /
+                               (Ron * capacitance * A)) / on_off_ratio
         
         # Initialize weights as zeros instead of random values
         self.weights = np.zeros((array_rows, array_columns))
        # print(f"Initialized weights shape: {self.weights.shape}")
 
+    def mvm(self, inputs, rows):
+        """
+        Computes the outputs of all columns for inputs applied on the selected rows
+        as a single matrix-vector product.
+        
+        The product sums in a different order than the original per-column loop.
+        With slope * time_step landing codes exactly on ramp grid points, a sum
+        that ties with a grid point can round to the other side, so a few percent
+        of random vectors (5 of 200 in our check) differ from the loop by +-1 TDC
+        code. Golden outputs recorded with the loop need that tolerance.
+        
+        Parameters:
+            inputs: Input values for the selected rows, shape (len(rows),) or (batch, len(rows))
+            rows: List of row indices the inputs are applied to
+            
+        Returns:
+            numpy array of column outputs, shape (array_columns,) or (batch, array_columns)
+        """
+        inputs = np.asarray(inputs, dtype=float)
+        if inputs.shape[-1] != len(rows):
+            raise ValueError("Number of inputs must match number of selected rows")
+        
+        return self.scaling_factor * (inputs @ self.weights[np.asarray(rows, dtype=int)])
+
     def compute_output(self, input_vector, row):
         """
         Computes the output for all 32 columns in the selected row.
@@ -34,21 +64,13 @@ class Crossbar:
         if len(input_vector) != 1:
             raise ValueError("Input vector must contain a single value for the selected row.")
         
-        column_outputs = []
-        
-        # Process all 32 columns
-        for col in range(self.array_columns):
-            if col % 2 == 0:  # even-numbered columns (0, 2, 4...)
-                weighted_sum = input_vector[0] * self.weights[row][col]
-                column_output = ((self.vin * self.pulse_period) / 
-                               (self.Ron * self.capacitance * self.A)) * (weighted_sum / self.on_off_ratio)
-                print(f"Column {col} output: {column_output}")
-            else:  # odd-numbered columns (1, 3, 5...)
-                column_output = 0
-                print(f"Column {col} output: {column_output}")
-            column_outputs.append(column_output)
+        # Process all 32 columns, odd-numbered columns (1, 3, 5...) are kept at 0
+        column_outputs = self.mvm(input_vector, [row])
+        column_outputs[1::2] = 0
+        if self.tracer.level >= COLUMN:
+            self.tracer.record_array(COLUMN, 'column_output', np.arange(len(column_outputs)), column_outputs)
 
-        return column_outputs
+        return column_outputs.tolist()
     def sum_odd_column(self, input_vector, selected_rows, column_idx):
         """
         Sum the outputs for a specific odd-numbered column across selected rows.
@@ -64,15 +86,10 @@ class Crossbar:
         if len(input_vector) != len(selected_rows):
             raise ValueError("Number of inputs must match number of selected rows")
             
-        column_sum = 0
-        for i, row in enumerate(selected_rows):
-            weighted_sum = input_vector[i] * self.weights[row][column_idx]
-            output = ((self.vin * self.pulse_period) /
-                     (self.Ron * self.capacitance * self.A)) * (weighted_sum / self.on_off_ratio)
-            column_sum += output
-            #print(f"Row {row}, Column {column_idx} contribution: {output}")
+        column_sum = self.mvm(input_vector, selected_rows)[column_idx]
             
-       # print(f"Total sum for Column {column_idx}: {column_sum}")
+        if self.tracer.level >= COLUMN:
+            self.tracer.record(COLUMN, 'column_sum', column_idx, column_sum)
         return column_sum
     
     def sum_even_column(self, input_vector, selected_rows, column_idx):
@@ -1,3 +1,5 @@
+import numpy as np
+
 class RampGenerator:
     def __init__(self, slope, time_step):
         self.slope = slope  # V/ns
@@ -17,6 +19,38 @@ class RampGenerator:
         #time_ns = time * 1e9
         self.current_value = self.slope * time_step
         return self.current_value
+
+    def time_grid(self, max_time, extra_steps=0):
+        """
+        Returns the times visited by the time-stepping loop, accumulated step by step
+        exactly as the loop does, up to the first step past max_time (plus extra_steps).
+        """
+        num_steps = int(max_time / self.time_step) + 3 + extra_steps
+        grid = np.concatenate(([0.0], np.cumsum(np.full(num_steps, float(self.time_step)))))
+        overflow_index = int(np.searchsorted(grid, max_time, side='right'))
+        return grid[:overflow_index + 1 + extra_steps]
+        
+    def values(self, times):
+        """
+        Ramp value at each of the given times, the vectorized get_value of an
+        enabled ramp.
+        """
+        return self.slope * np.asarray(times, dtype=float)
+        
+    def crossing_index(self, reference, time_grid):
+        """
+        Closed-form crossing of the linear ramp with the reference (t = V/slope),
+        quantized to the first point of time_grid where the ramp reaches reference.
+        Returns len(time_grid) - 1 when the ramp does not cross within the grid.
+        """
+        reference = np.asarray(reference, dtype=float)
+        last = len(time_grid) - 1
+        index = np.clip(np.ceil(reference / (self.slope * self.time_step)), 0, last).astype(int)
+        # Accumulated time steps drift from k*time_step by rounding only, so the
+        # estimate is at most one grid point away from the loop's crossing
+        index = np.where((index < last) & (self.slope * time_grid[index] < reference), index + 1, index)
+        index = np.where((index > 0) & (self.slope * time_grid[index - 1] >= reference), index - 1, index)
+        return index
         
     def get_energy(self, time_step):
         if not self.enabled:
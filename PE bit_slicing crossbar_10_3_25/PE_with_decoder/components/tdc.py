@@ -1,3 +1,5 @@
+import numpy as np
+
 class TDC:
     def __init__(self, num_tdc, time_precision):
         self.num_tdc = num_tdc
@@ -8,6 +10,14 @@ class TDC:
         time_diff = stop_time - start_time
         digital_value = int(time_diff / self.time_precision) 
         return min(digital_value, 2**self.num_tdc - 1)
+    
+    def quantize(self, start_time, stop_time):
+        """
+        Vectorized measure_time for arrays of start and stop times.
+        """
+        time_diff = np.asarray(stop_time) - start_time
+        digital_value = np.trunc(time_diff / self.time_precision).astype(np.int64)
+        return np.minimum(digital_value, 2**self.num_tdc - 1)
         
     def get_energy(self, measurement_time):
         return 0.2 * measurement_time
@@ -1,4 +1,5 @@
 import configparser
+import heapq
 from pathlib import Path
 import numpy as np
 from components.Dac import DAC
@@ -12,6 +13,7 @@ from Energy_metrics import EnergyMetrics
 from Delay_metrics import DelayMetrics
 from Power_metrics import PowerMetrics
 from Area_metrics import AreaMetrics
+from tracing import Tracer, SUMMARY, COLUMN, TIMESTEP
 
 class PWMSystem:
     def __init__(self, config_path):
@@ -26,6 +28,12 @@ class PWMSystem:
         return config
         
     def _initialize_components(self):
+        # Trace events replace printing on the hot path, off unless configured
+        self.tracer = Tracer(
+            level=self.config.get('Trace', 'level', fallback='off'),
+            sink=self.config.get('Trace', 'sink', fallback='') or None
+        )
+        
         # Initialize all components with configuration parameters
         self.decoder = Decoder(
             num_bits=self.config.getint('DAC', 'num_bits')
@@ -47,7 +55,8 @@ class PWMSystem:
             array_columns=self.config.getint('Crossbar', 'array_columns'),
             A=self.config.getfloat('Crossbar', 'A'),
             weight_bits=self.config.getint('Crossbar', 'weight_bits'),
-            vin=self.config.getfloat('Crossbar', 'vin')
+            vin=self.config.getfloat('Crossbar', 'vin'),
+            tracer=self.tracer
         )
         
         # Initialize 16 subtractors
@@ -63,6 +72,19 @@ class PWMSystem:
             time_precision=self.config.getfloat('TDC', 'time_precision')
         )
         
+        # analytic: closed-form crossing of the linear ramp
+        # stepping: time-stepping simulation of the ramp, for non-linear ramps
+        # event: one shared ramp sweep for all columns, converting concurrently
+        # sweep: as event, all sorted thresholds met by one vectorized sweep
+        self.crossing_mode = self.config.get('RampGenerator', 'crossing_mode', fallback='analytic')
+        if self.crossing_mode not in ('analytic', 'stepping', 'event', 'sweep'):
+            raise ValueError(f"Unknown crossing_mode '{self.crossing_mode}', expected 'analytic', 'stepping', 'event' or 'sweep'")
+        # The ramp keeps running across columns, so past max_time it can advance
+        # by one step per remaining column
+        self.time_grid = self.ramp_generator.time_grid(self.tdc.max_time, extra_steps=len(self.subtractors))
+        self.overflow_index = len(self.time_grid) - 1 - len(self.subtractors)
+        self.ramp_values = self.ramp_generator.values(self.time_grid)
+        
     def _initialize_metrics(self):
         # Create components dictionary for metrics calculators
         self.components = {
@@ -123,10 +145,11 @@ class PWMSystem:
         analog_outputs = [self.dac.convert(input_val) for input_val in digital_inputs]
     
         # Get all column outputs for all selected rows at once
+        column_outputs = self.crossbar.mvm(digital_inputs, selected_rows)
         subtracted_values = []
         for i in range(0, self.crossbar.array_columns, 2):
             # Sum odd-numbered column
-            odd_sum = self.crossbar.sum_odd_column(digital_inputs, selected_rows, i)
+            odd_sum = column_outputs[i]
             
             # Sum even-numbered column 
             even_sum = self.crossbar.sum_even_column(digital_inputs, selected_rows, i + 1)
@@ -134,41 +157,222 @@ class PWMSystem:
             # Use subtractor to get difference
             subtractor_idx = i // 2
             subtracted_value = self.subtractors[subtractor_idx].subtract(odd_sum, even_sum)
-           # print(f"Subtractor {subtractor_idx}: {odd_sum} - {even_sum} = {subtracted_value}")
+            if self.tracer.level >= COLUMN:
+                self.tracer.record(COLUMN, 'subtract', subtractor_idx, subtracted_value)
             subtracted_values.append(subtracted_value)
     
         # Initialize ramp generator
         self.ramp_generator.enable()
         start_time = 0
+    
+        # Find where the ramp crosses each subtracted value
+        if self.crossing_mode == 'analytic':
+            stop_times, end_times = self._analytic_crossings(subtracted_values)
+        elif self.crossing_mode == 'event':
+            stop_times, end_times = self._event_crossings(subtracted_values)
+        elif self.crossing_mode == 'sweep':
+            stop_times, end_times = self._sweep_crossings(subtracted_values)
+        else:
+            stop_times, end_times = self._stepping_crossings(subtracted_values)
+    
+        # Process each crossing to get final outputs
+        for col, (stop_time, current_time) in enumerate(zip(stop_times, end_times)):
+            max_operation_time = max(max_operation_time, float(current_time))
+        
+            if stop_time <= self.tdc.max_time:
+               output = self.tdc.measure_time(start_time, stop_time)
+               if self.tracer.level >= COLUMN:
+                   self.tracer.record(COLUMN, 'output', col, output, stop_time)
+               outputs.append(output)
+            else:
+                outputs.append(2**self.tdc.num_tdc - 1)
+    
+        if self.tracer.level >= SUMMARY:
+            self.tracer.record(SUMMARY, 'operation_time', time=max_operation_time)
+        metrics = self.calculate_metrics(max_operation_time)
+        return outputs, metrics
+        
+    def process_batch(self, inputs, selected_rows):
+        """
+        Process a batch of input vectors through the PWM system in one call.
+        Every stage is evaluated on whole arrays across the batch dimension.
+        
+        Parameters:
+            inputs: numpy array of shape (batch, len(selected_rows)) of digital input values
+            selected_rows: List of rows to apply inputs to
+        
+        Returns:
+            outputs: numpy array of TDC outputs, shape (batch, 16)
+            operation_times: numpy array of per-sample operation times, shape (batch,)
+        """
+        inputs = np.atleast_2d(np.asarray(inputs))
+        if inputs.shape[1] != len(selected_rows):
+            raise ValueError("Number of inputs must match number of selected rows")
+        
+        # Column outputs for every sample, odd-numbered columns are kept at 0
+        column_outputs = self.crossbar.mvm(inputs, selected_rows)
+        subtracted_values = np.stack([
+            subtractor.subtract(column_outputs[:, 2 * i], 0)
+            for i, subtractor in enumerate(self.subtractors)
+        ], axis=1)
+        
+        self.ramp_generator.enable()
+        start_time = 0
+        
+        if self.crossing_mode == 'analytic':
+            stop_times, end_times = self._analytic_crossings(subtracted_values)
+        elif self.crossing_mode == 'event':
+            stop_times, end_times = self._event_crossings(subtracted_values)
+        elif self.crossing_mode == 'sweep':
+            stop_times, end_times = self._sweep_crossings(subtracted_values)
+        else:
+            crossings = [self._stepping_crossings(values) for values in subtracted_values]
+            stop_times = np.array([stops for stops, _ in crossings])
+            end_times = np.array([ends for _, ends in crossings])
+        
+        outputs = np.where(stop_times <= self.tdc.max_time,
+                           self.tdc.quantize(start_time, stop_times),
+                           2**self.tdc.num_tdc - 1)
+        operation_times = np.maximum(end_times.max(axis=1), 0)
+        
+        if self.tracer.level >= COLUMN:
+            self.tracer.record_array(COLUMN, 'output', np.arange(outputs.shape[1]), outputs, stop_times)
+        if self.tracer.level >= SUMMARY:
+            self.tracer.record_array(SUMMARY, 'operation_time', -1, np.nan, operation_times)
+        return outputs, operation_times
+    
+    def _stepping_crossings(self, subtracted_values):
+        """
+        Steps the ramp by time_step until it crosses each subtracted value.
+        The ramp time carries over from one column to the next.
+        
+        Returns:
+            stop_times: Crossing time per column (tdc.max_time if the ramp never crosses)
+            end_times: Ramp time after each column
+        """
+        stop_times = []
+        end_times = []
         stop_time = 0
         current_time = 0
-    
-        # Process each subtracted value to get final outputs
-        for subtracted_value in subtracted_values:
+        trace_columns = self.tracer.level >= COLUMN
+        trace_steps = self.tracer.level >= TIMESTEP
+        time_step = self.ramp_generator.time_step
+        for col, subtracted_value in enumerate(subtracted_values):
             while True:
                 ramp_value = self.ramp_generator.get_value(current_time)
+                if trace_steps:
+                    self.tracer.record(TIMESTEP, 'ramp', col, ramp_value, current_time)
                 if self.comparator.compare(ramp_value, subtracted_value):
                     stop_time = current_time
-                    print(f"crossing_ponit: {stop_time}")
+                    if trace_columns:
+                        self.tracer.record(COLUMN, 'crossing', col, subtracted_value, stop_time)
                     break
             
-                current_time += self.config.getfloat('System', 'time_step')
+                current_time += time_step
                 if current_time > self.tdc.max_time:
                     stop_time = self.tdc.max_time
                     
                     break
+            
+            stop_times.append(stop_time)
+            end_times.append(current_time)
+        return stop_times, end_times
+    
+    def _analytic_crossings(self, subtracted_values):
+        """
+        Closed-form equivalent of _stepping_crossings for the linear ramp; gives the
+        same crossing times on the time_step grid without stepping through it.
+        Accepts subtracted values of shape (16,) or (batch, 16).
+        """
+        subtracted_values = np.asarray(subtracted_values, dtype=float)
+        crossings = self.ramp_generator.crossing_index(subtracted_values, self.time_grid)
+        stop_times = np.empty(crossings.shape)
+        end_times = np.empty(crossings.shape)
+        position = np.zeros(crossings.shape[:-1], dtype=int)
+        for col in range(crossings.shape[-1]):
+            crossing = crossings[..., col]
+            running = position < self.overflow_index
+            # Before max_time: crosses at the first grid point at or after the carried-over time
+            # Past max_time: the loop checks one point and then advances one step
+            crossed = np.where(running, crossing < self.overflow_index, crossing <= position)
+            position = np.where(running,
+                                np.minimum(np.maximum(position, crossing), self.overflow_index),
+                                np.where(crossed, position, position + 1))
+            end_times[..., col] = self.time_grid[position]
+            stop_times[..., col] = np.where(crossed, end_times[..., col], self.tdc.max_time)
+            if self.tracer.level >= COLUMN:
+                self.tracer.record_array(COLUMN, 'crossing', col, subtracted_values[..., col][crossed],
+                                         stop_times[..., col][crossed])
         
-            max_operation_time = max(max_operation_time, current_time)
+        # Leave the ramp and comparator in the state the last loop iteration would
+        last_position = position.flat[-1] if crossed.flat[-1] else position.flat[-1] - 1
+        ramp_value = self.ramp_generator.get_value(float(self.time_grid[last_position]))
+        self.comparator.compare(ramp_value, float(subtracted_values.flat[-1]))
+        return stop_times, end_times
+    
+    def _event_crossings(self, subtracted_values):
+        """
+        Event-driven conversion: unlike the other modes, where the ramp carries
+        over from column to column, all comparators watch a single sweep of the
+        shared ramp as in hardware. Pending crossings are kept in a priority
+        queue ordered by time and simulated time jumps from one crossing event
+        to the next, so the operation time is that of the last crossing.
+        Accepts subtracted values of shape (16,) or (batch, 16).
+        """
+        subtracted_values = np.asarray(subtracted_values, dtype=float)
+        sweeps = subtracted_values.reshape(-1, subtracted_values.shape[-1])
+        stop_times = np.full(sweeps.shape, self.tdc.max_time)
+        end_times = np.full(sweeps.shape, float(self.time_grid[self.overflow_index]))
+        trace_columns = self.tracer.level >= COLUMN
+        trace_steps = self.tracer.level >= TIMESTEP
         
-            if stop_time <= self.tdc.max_time:
-               output = self.tdc.measure_time(start_time, stop_time)
-               print(f"Start: {start_time}, Stop: {stop_time}, Output: {output}")
-               outputs.append(output)
-            else:
-                outputs.append(2**self.tdc.num_tdc - 1)
+        # Scheduled event of every column: the grid point at which the ramp reaches it
+        event_indices = self.ramp_generator.crossing_index(sweeps, self.time_grid).tolist()
+        for sweep, (values, indices) in enumerate(zip(sweeps.tolist(), event_indices)):
+            pending = [(index, col) for col, index in enumerate(indices)]
+            heapq.heapify(pending)
+            self.ramp_generator.enable()
+            while pending and pending[0][0] < self.overflow_index:
+                # Jump to the next event and resolve every comparator that trips there
+                index = pending[0][0]
+                current_time = float(self.time_grid[index])
+                ramp_value = self.ramp_generator.get_value(current_time)
+                if trace_steps:
+                    self.tracer.record(TIMESTEP, 'ramp', -1, ramp_value, current_time)
+                while pending and pending[0][0] == index:
+                    _, col = heapq.heappop(pending)
+                    if not self.comparator.compare(ramp_value, values[col]):
+                        # Not tripped yet, check again on the next grid point
+                        heapq.heappush(pending, (index + 1, col))
+                        continue
+                    stop_times[sweep, col] = end_times[sweep, col] = current_time
+                    if trace_columns:
+                        self.tracer.record(COLUMN, 'crossing', col, values[col], current_time)
+            # Columns still pending when the ramp passes max_time never cross
+        return stop_times.reshape(subtracted_values.shape), end_times.reshape(subtracted_values.shape)
     
-        metrics = self.calculate_metrics(max_operation_time)
-        return outputs, metrics
+    def _sweep_crossings(self, subtracted_values):
+        """
+        Shared-ramp conversion as a sorted-threshold sweep: the subtracted values
+        of all columns (and samples) are sorted and met by one monotone sweep of
+        the ramp over the time grid, np.searchsorted assigning every crossing in
+        O(n log n). Works for any ramp that rises monotonically over the grid.
+        The latest crossing of each row bounds its shared conversion window.
+        Accepts subtracted values of shape (16,) or (batch, 16).
+        """
+        subtracted_values = np.asarray(subtracted_values, dtype=float)
+        order = np.argsort(subtracted_values, axis=None)
+        index = np.empty(subtracted_values.size, dtype=int)
+        # First grid point at which the ramp reaches each threshold
+        index[order] = np.searchsorted(self.ramp_values, subtracted_values.ravel()[order], side='left')
+        index = np.minimum(index, self.overflow_index).reshape(subtracted_values.shape)
+        crossed = index < self.overflow_index
+        end_times = self.time_grid[index]
+        stop_times = np.where(crossed, end_times, self.tdc.max_time)
+        if self.tracer.level >= COLUMN:
+            columns = np.broadcast_to(np.arange(index.shape[-1]), index.shape)
+            self.tracer.record_array(COLUMN, 'crossing', columns[crossed], subtracted_values[crossed], end_times[crossed])
+        return stop_times, end_times
         
     def calculate_metrics(self, operation_time):
         """Calculate energy and delay metrics for the system using separate modules"""
@@ -0,0 +1,18 @@
+"""
+Trace recording is shared with the PE variant: this module loads PE/tracing.py
+so both variants run the same Tracer.
+"""
+import sys
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+_spec = spec_from_file_location('pe_tracing', Path(__file__).resolve().parent.parent / 'PE' / 'tracing.py')
+_tracing = sys.modules.get('pe_tracing')
+if _tracing is None:
+    _tracing = sys.modules['pe_tracing'] = module_from_spec(_spec)
+    _spec.loader.exec_module(_tracing)
+
+OFF, SUMMARY, COLUMN, TIMESTEP = _tracing.OFF, _tracing.SUMMARY, _tracing.COLUMN, _tracing.TIMESTEP
+LEVELS = _tracing.LEVELS
+EVENT_DTYPE = _tracing.EVENT_DTYPE
+Tracer = _tracing.Tracer
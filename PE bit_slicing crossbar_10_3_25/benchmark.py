@@ -0,0 +1,262 @@
+"""
+Benchmark suite for the PE simulators.
+
+Every variant directory (PE, PE_with_decoder) is benchmarked in its own
+subprocess with the directory as working directory, as its modules share
+names. Results are written as JSON together with environment metadata and can
+be compared against a saved baseline:
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json --tolerance 0.1
+"""
+import argparse
+import configparser
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+VARIANTS = ('PE', 'PE_with_decoder')
+SEED = 0
+
+
+def _time(function, repeats):
+    function()  # warm-up, also builds lazily computed state
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+# Cases of the PE variant. Each returns (function to time, items per call, unit)
+
+def pe_single_vector():
+    from pwm_system import PWMSystem
+    rng = np.random.default_rng(SEED)
+    system = PWMSystem('config.ini')
+    system.set_weights(rng.integers(0, 16, (32, 32)).astype(float))
+    inputs = rng.integers(0, 16, 32).tolist()
+    return lambda: system.process_inputs(inputs, list(range(32))), 1, 'vectors'
+
+
+def pe_batched():
+    from pwm_system import PWMSystem
+    rng = np.random.default_rng(SEED)
+    system = PWMSystem('config.ini')
+    system.set_weights(rng.integers(0, 16, (32, 32)).astype(float))
+    inputs = rng.integers(0, 16, (4096, 32))
+    return lambda: system.process_batch(inputs, list(range(32))), len(inputs), 'vectors'
+
+
+def pe_bit_sliced():
+    from PE_quantization import QuantizedPWMSystem
+    rng = np.random.default_rng(SEED)
+    system = QuantizedPWMSystem('config.ini')
+    system.set_weights(rng.integers(0, 1 << 16, system.crossbar.array_rows * system.weights_per_row))
+    inputs = rng.integers(0, 1 << 16, (1024, 32))
+    return lambda: system.process_batch(inputs, list(range(32))), len(inputs), 'vectors'
+
+
+def pe_tiled():
+    from tiling import TiledMVM
+    rng = np.random.default_rng(SEED)
+    tiled = TiledMVM('config.ini', rng.integers(0, 1 << 16, (1024, 1024)))
+    inputs = rng.integers(0, 1 << 16, (8, 1024))
+    return lambda: tiled.run(inputs), len(inputs), 'vectors'
+
+
+def pe_ramp_heavy(crossing_mode, num_samples):
+    from pwm_system import PWMSystem
+    from pe_config import PEConfig
+    rng = np.random.default_rng(SEED)
+    system = PWMSystem(PEConfig.load('config.ini', num_tdc=14, time_step=25e-12, crossing_mode=crossing_mode))
+    system.set_weights(rng.integers(0, 16, (32, 32)).astype(float))
+    inputs = rng.integers(0, 16, (num_samples, 32))
+    return lambda: system.process_batch(inputs, list(range(32))), num_samples, 'vectors'
+
+
+# Cases of the decoder variant
+
+def _decoder_system(**overrides):
+    from pwm_system import PWMSystem
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+    for option, (section, value) in overrides.items():
+        config.set(section, option, str(value))
+    # The decoder variant only reads config files
+    with tempfile.NamedTemporaryFile('w', suffix='.ini', delete=False) as f:
+        config.write(f)
+    try:
+        system = PWMSystem(f.name)
+    finally:
+        os.unlink(f.name)
+    rng = np.random.default_rng(SEED)
+    rows, columns = system.crossbar.array_rows, system.crossbar.array_columns
+    max_weight = (1 << system.config.getint('Crossbar', 'weight_bits')) - 1
+    system.set_weights(rng.integers(0, max_weight + 1, (rows, columns)).astype(float))
+    return system, rng
+
+
+def decoder_single_vector():
+    system, rng = _decoder_system()
+    inputs = rng.integers(0, 1 << system.num_bits, 32).tolist()
+    return lambda: system.process_inputs(inputs, list(range(32))), 1, 'vectors'
+
+
+def decoder_batched():
+    system, rng = _decoder_system()
+    inputs = rng.integers(0, 1 << system.num_bits, (4096, 32))
+    return lambda: system.process_batch(inputs, list(range(32))), len(inputs), 'vectors'
+
+
+def decoder_ramp_heavy(crossing_mode, num_samples):
+    system, rng = _decoder_system(num_tdc=('TDC', 14), time_step=('System', 25e-12),
+                                  crossing_mode=('RampGenerator', crossing_mode))
+    inputs = rng.integers(0, 1 << system.num_bits, (num_samples, 32))
+    return lambda: system.process_batch(inputs, list(range(32))), num_samples, 'vectors'
+
+
+CASES = {
+    'PE': {
+        'single_vector_latency': pe_single_vector,
+        'batched_throughput': pe_batched,
+        'bit_sliced_16bit': pe_bit_sliced,
+        'tiled_1024x1024': pe_tiled,
+        'ramp_heavy_analytic': lambda: pe_ramp_heavy('analytic', 4096),
+        'ramp_heavy_sweep': lambda: pe_ramp_heavy('sweep', 4096),
+        'ramp_heavy_event': lambda: pe_ramp_heavy('event', 256),
+        'ramp_heavy_stepping': lambda: pe_ramp_heavy('stepping', 1),
+    },
+    'PE_with_decoder': {
+        'single_vector_latency': decoder_single_vector,
+        'batched_throughput': decoder_batched,
+        'ramp_heavy_analytic': lambda: decoder_ramp_heavy('analytic', 4096),
+        'ramp_heavy_sweep': lambda: decoder_ramp_heavy('sweep', 4096),
+        'ramp_heavy_event': lambda: decoder_ramp_heavy('event', 256),
+        'ramp_heavy_stepping': lambda: decoder_ramp_heavy('stepping', 1),
+    },
+}
+
+
+def run_variant(variant, cases, repeats):
+    """
+    Runs the cases of one variant in this process. The working directory must
+    be the variant directory.
+    """
+    sys.path.insert(0, os.getcwd())
+    results = {}
+    for name, setup in CASES[variant].items():
+        if cases and name not in cases:
+            continue
+        function, items, unit = setup()
+        times = _time(function, repeats)
+        median = statistics.median(times)
+        results[f"{variant}/{name}"] = {
+            'repeats': repeats,
+            'min': min(times),
+            'median': median,
+            'mean': statistics.fmean(times),
+            'items': items,
+            'throughput': items / median,
+            'unit': f"{unit}/s",
+        }
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit,
+    }
+
+
+def run(variants, cases, repeats):
+    results = {}
+    for variant in variants:
+        command = [sys.executable, str(Path(__file__).resolve()), '--worker', variant,
+                   '--repeats', str(repeats)]
+        if cases:
+            command += ['--cases', *cases]
+        output = subprocess.run(command, cwd=ROOT / variant, capture_output=True, text=True)
+        if output.returncode != 0:
+            raise RuntimeError(f"Benchmark of {variant} failed:\n{output.stderr}")
+        results.update(json.loads(output.stdout.splitlines()[-1]))
+    return {'environment': environment(), 'results': results}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Median times against a baseline run. A case regresses when its median is
+    more than tolerance (relative) slower than in the baseline.
+
+    Returns:
+        List of (case, baseline median, median, relative change, regressed)
+    """
+    rows = []
+    for case, result in results['results'].items():
+        reference = baseline['results'].get(case)
+        if reference is None:
+            continue
+        change = result['median'] / reference['median'] - 1
+        rows.append((case, reference['median'], result['median'], change, change > tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=VARIANTS)
+    parser.add_argument('--cases', nargs='+', help="Only run these case names")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help="JSON file to write the results to")
+    parser.add_argument('--baseline', help="JSON results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--worker', choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_variant(args.worker, args.cases, args.repeats)))
+        return 0
+
+    results = run(args.variants, args.cases, args.repeats)
+    for case, result in results['results'].items():
+        print(f"{case:<40} median {result['median'] * 1e3:10.3f} ms  "
+              f"{result['throughput']:14.1f} {result['unit']}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = 0
+        for case, before, after, change, regressed in compare(results, baseline, args.tolerance):
+            regressions += regressed
+            print(f"{'REGRESSION' if regressed else 'ok':<11}{case:<40} "
+                  f"{before * 1e3:10.3f} ms -> {after * 1e3:10.3f} ms ({change:+.1%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())